@@ -2,3 +2,4 @@ from __future__ import annotations
 
 from . import mysql
 from . import sqlite
+from . import stats
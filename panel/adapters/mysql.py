@@ -1,16 +1,158 @@
 from __future__ import annotations
 
+import asyncio
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from functools import wraps
 from typing import Any
+from typing import AsyncIterator
+from typing import Callable
+from typing import Iterable
 from typing import Optional
+from typing import Sequence
+from typing import TypeVar
 
 import aiomysql
 
 from panel import logger
+from panel.adapters.stats import QueryStatistics
+from panel.adapters.stats import QueryTimer
+
+T = TypeVar("T")
+
+# Set once the current request has written to the primary, so that its later reads
+# are not served stale data by a lagging replica. `None` outside of a request scope,
+# where writes are not tracked: background tasks copy the context they were started
+# from and would otherwise stay stuck on the primary after a startup write.
+_wrote_primary: ContextVar[Optional[bool]] = ContextVar(
+    "mysql_wrote_primary",
+    default=None,
+)
+
+# Read results memoised for the current handler, keyed on the query and its args.
+# `None` unless the handler opted in with `memoise_reads`.
+_read_memo: ContextVar[Optional[dict[tuple, Any]]] = ContextVar(
+    "mysql_read_memo",
+    default=None,
+)
+
+
+def _mark_written() -> None:
+    """Records a write in the current request, dropping anything memoised so far."""
+    if _wrote_primary.get() is not None:
+        _wrote_primary.set(True)
+
+    memo = _read_memo.get()
+    if memo:
+        memo.clear()
+
+
+def memoise_reads(func: Callable) -> Callable:
+    """Decorator around a web handler which memoises identical reads made while it
+    runs. Any write drops what has been memoised so far."""
+
+    @wraps(func)
+    async def new_func(*args, **kwargs):
+        token = _read_memo.set({})
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            _read_memo.reset(token)
+
+    return new_func
+
+
+def _memo_key(kind: str, query: str, args: tuple, primary: bool) -> Optional[tuple]:
+    key = (kind, query, args, primary)
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+class MySQLTransaction:
+    """
+    A single pooled connection pinned for the duration of a transaction. Exposes
+    the same query methods as `MySQLPool`, without committing per statement.
+    """
+
+    def __init__(self, conn: aiomysql.Connection, stats: QueryStatistics) -> None:
+        self._conn = conn
+        self._stats = stats
+
+    async def execute(self, query: str, args: tuple = ()) -> int:
+        """
+        Execute a sql statement within the transaction.
+        """
+        timer = self._stats.timer(query)
+        async with self._conn.cursor() as cursor:
+            await cursor.execute(query, args)
+            row_id = cursor.lastrowid
+            timer.finish(cursor.rowcount)
+            logger.debug(f"MySQL (tx): {row_id!r}, {query!r}, {args!r}")
+            return row_id
+
+    async def execute_many(self, query: str, args_list: Iterable[tuple]) -> int:
+        """
+        Execute one sql statement for every args tuple within the transaction.
+        """
+        args_list = list(args_list)
+        if not args_list:
+            return 0
+
+        timer = self._stats.timer(query)
+        async with self._conn.cursor() as cursor:
+            affected = await cursor.executemany(query, args_list)
+            timer.finish(affected or 0)
+            logger.debug(
+                f"MySQL (tx): {affected!r}, {query!r}, {len(args_list)} arg sets",
+            )
+            return affected or 0
+
+    async def fetch_one(self, query: str, args: tuple = ()) -> Optional[tuple]:
+        """
+        Fetch one row within the transaction.
+        """
+        timer = self._stats.timer(query)
+        async with self._conn.cursor() as cursor:
+            await cursor.execute(query, args)
+            row = await cursor.fetchone()
+            timer.finish(int(row is not None))
+            logger.debug(f"MySQL (tx): {row!r}, {query!r}, {args!r}")
+            return row
+
+    async def fetch_all(self, query: str, args: tuple = ()) -> list[tuple]:
+        """
+        Fetch all rows within the transaction.
+        """
+        timer = self._stats.timer(query)
+        async with self._conn.cursor() as cursor:
+            await cursor.execute(query, args)
+            rows = await cursor.fetchall()
+            timer.finish(len(rows))
+            logger.debug(f"MySQL (tx): {len(rows)} rows, {query!r}, {args!r}")
+            return rows
+
+    async def fetch_val(self, query: str, args: tuple = ()) -> Any:
+        """
+        Fetch one value within the transaction.
+        """
+        row = await self.fetch_one(query, args)
+        if row is None:
+            return None
+        return row[0]
 
 
 class MySQLPool:
     """
     Async MySQL connection pool wrapper using aiomysql.
+
+    If a replica host is given, `fetch_*` calls are routed to it unless `primary`
+    is passed or the current task has already written to the primary.
+
+    Within a request scope (`begin_request`/`end_request`), identical `fetch_*`
+    calls are memoised until the request ends or it writes to the database.
     """
 
     def __init__(
@@ -22,6 +164,12 @@ class MySQLPool:
         database: str = "test",
         pool_name: str = "mypool",
         pool_size: int = 10,
+        min_pool_size: int = 1,
+        pool_recycle: int = -1,
+        replica_host: str = "",
+        replica_port: int = 3306,
+        replica_user: str = "",
+        replica_password: str = "",
     ) -> None:
         self._host = host
         self._port = port
@@ -29,7 +177,16 @@ class MySQLPool:
         self._password = password
         self._database = database
         self._pool_size = pool_size
+        self._min_pool_size = min(min_pool_size, pool_size)
+        self._pool_recycle = pool_recycle
+        self._replica_host = replica_host
+        self._replica_port = replica_port
+        self._replica_user = replica_user or user
+        self._replica_password = replica_password or password
         self.pool: Optional[aiomysql.Pool] = None
+        self.replica_pool: Optional[aiomysql.Pool] = None
+        self.stats = QueryStatistics()
+        self._waiters: dict[int, int] = {}
 
     async def connect(self) -> None:
         """Initializes the connection pool."""
@@ -39,75 +196,334 @@ class MySQLPool:
             user=self._user,
             password=self._password,
             db=self._database,
-            minsize=1,
+            minsize=self._min_pool_size,
             maxsize=self._pool_size,
+            pool_recycle=self._pool_recycle,
             autocommit=True,
         )
 
+        if self._replica_host:
+            self.replica_pool = await aiomysql.create_pool(
+                host=self._replica_host,
+                port=self._replica_port,
+                user=self._replica_user,
+                password=self._replica_password,
+                db=self._database,
+                minsize=self._min_pool_size,
+                maxsize=self._pool_size,
+                pool_recycle=self._pool_recycle,
+                autocommit=True,
+            )
+
+    async def warm_up(self, connections: int) -> None:
+        """Opens up to `connections` connections in every pool ahead of time, so the
+        first burst of queries does not pay for connection setup."""
+        for pool in (self.pool, self.replica_pool):
+            if pool is None:
+                continue
+
+            # Acquiring hands out the idle connections first, so those have to be
+            # taken as well for new ones to be opened.
+            size_before = pool.size
+            count = min(connections, pool.maxsize) - pool.size + pool.freesize
+            if count <= pool.freesize:
+                continue
+
+            conns = await asyncio.gather(*(pool.acquire() for _ in range(count)))
+            for conn in conns:
+                await pool.release(conn)
+
+            logger.info(f"Warmed up {pool.size - size_before} MySQL connections.")
+
+    def _pool_status(self, pool: aiomysql.Pool) -> dict[str, int]:
+        return {
+            "size": pool.size,
+            "in_use": pool.size - pool.freesize,
+            "idle": pool.freesize,
+            "waiters": self._waiters.get(id(pool), 0),
+            "min_size": pool.minsize,
+            "max_size": pool.maxsize,
+        }
+
+    def pool_status(self) -> dict[str, Optional[dict[str, int]]]:
+        """Returns live gauges for the primary and replica pools."""
+        return {
+            "primary": self._pool_status(self.pool) if self.pool else None,
+            "replica": (
+                self._pool_status(self.replica_pool) if self.replica_pool else None
+            ),
+        }
+
     async def close(self) -> None:
         """Closes the connection pool."""
         if self.pool:
             self.pool.close()
             await self.pool.wait_closed()
+        if self.replica_pool:
+            self.replica_pool.close()
+            await self.replica_pool.wait_closed()
+
+    def begin_request(self) -> None:
+        """Opens a request scope, so reads only stick to the primary after a write
+        made during this request."""
+        _wrote_primary.set(False)
+
+    def end_request(self) -> None:
+        """Closes the request scope."""
+        _wrote_primary.set(None)
+
+    def _write_pool(self) -> aiomysql.Pool:
+        """Returns the primary pool, which all writes go to."""
+        if not self.pool:
+            raise RuntimeError("Database pool not initialized. Call connect() first.")
+
+        return self.pool
+
+    def _read_pool(self, primary: bool) -> aiomysql.Pool:
+        """Picks the pool a read should be served from."""
+        pool = self._write_pool()
+
+        if primary or self.replica_pool is None or _wrote_primary.get():
+            return pool
+        return self.replica_pool
+
+    @asynccontextmanager
+    async def _acquire(
+        self,
+        pool: aiomysql.Pool,
+        timer: QueryTimer,
+    ) -> AsyncIterator[aiomysql.Connection]:
+        """Checks a connection out of `pool`, keeping track of how many callers are
+        waiting for one."""
+        self._waiters[id(pool)] = self._waiters.get(id(pool), 0) + 1
+        try:
+            conn = await pool.acquire()
+        finally:
+            self._waiters[id(pool)] -= 1
+
+        timer.acquired()
+        try:
+            yield conn
+        finally:
+            await pool.release(conn)
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[MySQLTransaction]:
+        """
+        Pins a single connection and opens a transaction on it. The transaction is
+        committed once the block exits, or rolled back if it raises.
+        """
+        pool = self._write_pool()
+
+        timer = self.stats.timer("BEGIN")
+        async with self._acquire(pool, timer) as conn:
+            _mark_written()
+            await conn.begin()
+            timer.finish(0)
+
+            try:
+                yield MySQLTransaction(conn, self.stats)
+            except BaseException:
+                await conn.rollback()
+                raise
+
+            timer = self.stats.timer("COMMIT")
+            timer.acquired()
+            await conn.commit()
+            timer.finish(0)
+            # Reads memoised while the transaction was open may now be stale.
+            _mark_written()
 
     async def execute(self, query: str, args: tuple = (), commit: bool = True) -> int:
         """
         Execute a sql statement.
         """
-        if not self.pool:
-            raise RuntimeError("Database pool not initialized. Call connect() first.")
+        pool = self._write_pool()
 
-        async with self.pool.acquire() as conn:
+        timer = self.stats.timer(query)
+        async with self._acquire(pool, timer) as conn:
+            _mark_written()
             async with conn.cursor() as cursor:
                 await cursor.execute(query, args)
                 if commit:
                     await conn.commit()
-                
+
                 row_id = cursor.lastrowid
+                timer.finish(cursor.rowcount)
                 logger.debug(f"MySQL: {row_id!r}, {query!r}, {args!r}")
                 return row_id
 
-    async def fetch_one(self, query: str, args: tuple = ()) -> Optional[tuple]:
+    async def execute_many(self, query: str, args_list: Iterable[tuple]) -> int:
         """
-        Fetch one row from database.
+        Execute one sql statement for every args tuple on a single connection.
+        Simple `INSERT ... VALUES` statements are sent as a single multi-row insert.
         """
-        if not self.pool:
-            raise RuntimeError("Database pool not initialized. Call connect() first.")
+        pool = self._write_pool()
+
+        args_list = list(args_list)
+        if not args_list:
+            return 0
 
-        async with self.pool.acquire() as conn:
+        timer = self.stats.timer(query)
+        async with self._acquire(pool, timer) as conn:
+            _mark_written()
+            async with conn.cursor() as cursor:
+                affected = await cursor.executemany(query, args_list)
+                timer.finish(affected or 0)
+                logger.debug(
+                    f"MySQL: {affected!r}, {query!r}, {len(args_list)} arg sets",
+                )
+                return affected or 0
+
+    async def execute_batch(self, statements: Sequence[tuple[str, tuple]]) -> None:
+        """
+        Execute a list of `(query, args)` statements in one round-trip on a single
+        connection, committing once. Nothing is applied if any statement fails.
+        """
+        pool = self._write_pool()
+
+        if not statements:
+            return
+
+        batch_query = "; ".join(query for query, _ in statements)
+        timer = self.stats.timer(batch_query)
+        async with self._acquire(pool, timer) as conn:
+            _mark_written()
+            async with conn.cursor() as cursor:
+                # Arguments are escaped client side so the statements can be sent
+                # together as a single multi-statement query.
+                compiled = "; ".join(
+                    cursor.mogrify(query, args) for query, args in statements
+                )
+
+                await conn.begin()
+                try:
+                    await cursor.execute(compiled)
+                    affected = cursor.rowcount
+                    while await cursor.nextset():
+                        affected += cursor.rowcount
+                    await conn.commit()
+                except BaseException:
+                    await conn.rollback()
+                    raise
+
+                timer.finish(affected)
+                logger.debug(f"MySQL: {affected!r}, {batch_query!r}")
+
+    async def fetch_one(
+        self,
+        query: str,
+        args: tuple = (),
+        primary: bool = False,
+    ) -> Optional[tuple]:
+        """
+        Fetch one row from database. Pass `primary` to bypass the replica.
+        """
+        pool = self._read_pool(primary)
+        memo = _read_memo.get()
+        memo_key = _memo_key("one", query, args, pool is self.pool)
+        if memo is not None and memo_key in memo:
+            return memo[memo_key]
+
+        timer = self.stats.timer(query)
+        async with self._acquire(pool, timer) as conn:
             async with conn.cursor() as cursor:
                 await cursor.execute(query, args)
                 row = await cursor.fetchone()
+                timer.finish(int(row is not None))
                 logger.debug(f"MySQL: {row!r}, {query!r}, {args!r}")
-                return row
 
-    async def fetch_all(self, query: str, args: tuple = ()) -> list[tuple]:
+        if memo is not None and memo_key is not None:
+            memo[memo_key] = row
+        return row
+
+    async def fetch_all(
+        self,
+        query: str,
+        args: tuple = (),
+        primary: bool = False,
+    ) -> list[tuple]:
         """
-        Fetch all rows from database.
+        Fetch all rows from database. Pass `primary` to bypass the replica.
         """
-        if not self.pool:
-            raise RuntimeError("Database pool not initialized. Call connect() first.")
+        pool = self._read_pool(primary)
+        memo = _read_memo.get()
+        memo_key = _memo_key("all", query, args, pool is self.pool)
+        if memo is not None and memo_key in memo:
+            return memo[memo_key]
 
-        async with self.pool.acquire() as conn:
+        timer = self.stats.timer(query)
+        async with self._acquire(pool, timer) as conn:
             async with conn.cursor() as cursor:
                 await cursor.execute(query, args)
                 rows = await cursor.fetchall()
-                logger.debug(f"MySQL: {rows!r}, {query!r}, {args!r}")
-                return rows
+                timer.finish(len(rows))
+                # Only the row count is logged; formatting every row is expensive.
+                logger.debug(f"MySQL: {len(rows)} rows, {query!r}, {args!r}")
 
-    async def fetch_val(self, query: str, args: tuple = ()) -> Any:
+        if memo is not None and memo_key is not None:
+            memo[memo_key] = rows
+        return rows
+
+    async def fetch_all_as(
+        self,
+        row_type: Callable[..., T],
+        query: str,
+        args: tuple = (),
+        primary: bool = False,
+    ) -> list[T]:
         """
-        Fetch one value from database.
+        Fetch all rows from database, built into `row_type` (eg. a `NamedTuple`)
+        positionally from the selected columns.
         """
-        if not self.pool:
-            raise RuntimeError("Database pool not initialized. Call connect() first.")
+        rows = await self.fetch_all(query, args, primary)
+        return [row_type(*row) for row in rows]
 
-        async with self.pool.acquire() as conn:
-            async with conn.cursor() as cursor:
+    async def fetch_iter(
+        self,
+        query: str,
+        args: tuple = (),
+        batch_size: int = 1000,
+        primary: bool = False,
+    ) -> AsyncIterator[tuple]:
+        """
+        Stream rows from database using an unbuffered server side cursor, holding
+        at most `batch_size` rows in memory at a time.
+
+        Note:
+            The connection stays checked out until iteration finishes, so avoid
+            issuing other queries on the same table while iterating. Pass
+            `primary` to bypass the replica.
+        """
+        pool = self._read_pool(primary)
+        timer = self.stats.timer(query)
+        async with self._acquire(pool, timer) as conn:
+            async with conn.cursor(aiomysql.SSCursor) as cursor:
                 await cursor.execute(query, args)
-                val = await cursor.fetchone()
-                logger.debug(f"MySQL: {val!r}, {query!r}, {args!r}")
-                
-                if val is None:
-                    return None
-                return val[0]
\ No newline at end of file
+
+                row_count = 0
+                while True:
+                    rows = await cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+
+                    row_count += len(rows)
+                    for row in rows:
+                        yield row
+
+                timer.finish(row_count)
+                logger.debug(f"MySQL: streamed {row_count} rows, {query!r}, {args!r}")
+
+    async def fetch_val(
+        self,
+        query: str,
+        args: tuple = (),
+        primary: bool = False,
+    ) -> Any:
+        """
+        Fetch one value from database. Pass `primary` to bypass the replica.
+        """
+        val = await self.fetch_one(query, args, primary)
+        if val is None:
+            return None
+        return val[0]
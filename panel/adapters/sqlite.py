@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 import aiosqlite
 from typing import Any
 from typing import Optional
@@ -8,26 +9,123 @@ from panel import logger
 
 
 class Sqlite:
-    def __init__(self, db: str):
+    def __init__(
+        self,
+        db: str,
+        flush_interval: float = 1.0,
+        flush_threshold: int = 100,
+    ):
         self.db = db
         self.conn: Optional[aiosqlite.Connection] = None
 
+        # Write-behind buffer for `execute_buffered`.
+        self._flush_interval = flush_interval
+        self._flush_threshold = flush_threshold
+        self._write_buffer: list[tuple[str, tuple]] = []
+        self._flush_lock = asyncio.Lock()
+        self._flush_event: Optional[asyncio.Event] = None
+        self._flush_task: Optional[asyncio.Task] = None
+
     async def connect(self) -> None:
         self.conn = await aiosqlite.connect(self.db)
 
+        # WAL lets readers carry on while a write is being committed, and with it
+        # NORMAL sync is still safe against corruption.
+        await self.conn.execute("PRAGMA journal_mode=WAL")
+        await self.conn.execute("PRAGMA synchronous=NORMAL")
+
+        self._flush_event = asyncio.Event()
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
     async def execute(self, query: str, args: tuple = (), commit: bool = True) -> int:
         if not self.conn:
              raise RuntimeError("Sqlite connection not initialized.")
-        
-        cursor = await self.conn.execute(query, args)
-        
-        if commit:
-            await self.conn.commit()
 
-        row_id = cursor.lastrowid if cursor.lastrowid else 0
-        logger.debug(f"Sqlite: {row_id!r}, {query!r}, {args!r}")
-        await cursor.close()
-        return row_id
+        # Shares the connection with the flusher, so it must not land mid-batch.
+        async with self._flush_lock:
+            cursor = await self.conn.execute(query, args)
+
+            if commit:
+                await self.conn.commit()
+
+            row_id = cursor.lastrowid if cursor.lastrowid else 0
+            logger.debug(f"Sqlite: {row_id!r}, {query!r}, {args!r}")
+            await cursor.close()
+            return row_id
+
+    def execute_buffered(self, query: str, args: tuple = ()) -> None:
+        """Queues a write to be applied by the background flusher. Queued writes are
+        committed together in one transaction, either every `flush_interval` seconds
+        or once `flush_threshold` of them are waiting."""
+        self._write_buffer.append((query, args))
+
+        if len(self._write_buffer) >= self._flush_threshold and self._flush_event:
+            self._flush_event.set()
+
+    async def flush(self) -> int:
+        """Commits all buffered writes in a single transaction, returning how many
+        were applied. If the database is busy the batch is kept for the next flush,
+        while any other failure retries the writes one by one, dropping only the
+        ones that fail."""
+        if not self.conn:
+             raise RuntimeError("Sqlite connection not initialized.")
+
+        async with self._flush_lock:
+            if not self._write_buffer:
+                return 0
+
+            buffer, self._write_buffer = self._write_buffer, []
+            try:
+                for query, args in buffer:
+                    cursor = await self.conn.execute(query, args)
+                    await cursor.close()
+                await self.conn.commit()
+            except (asyncio.CancelledError, aiosqlite.OperationalError):
+                # Put the batch back ahead of anything queued since, so order holds.
+                await self.conn.rollback()
+                self._write_buffer[:0] = buffer
+                raise
+            except Exception as e:
+                await self.conn.rollback()
+                logger.warning(f"Sqlite: buffered batch failed ({e}), retrying singly")
+                return await self._apply_singly(buffer)
+
+            logger.debug(f"Sqlite: flushed {len(buffer)} buffered writes")
+            return len(buffer)
+
+    async def _apply_singly(self, buffer: list[tuple[str, tuple]]) -> int:
+        assert self.conn is not None
+
+        applied = 0
+        for query, args in buffer:
+            try:
+                cursor = await self.conn.execute(query, args)
+                await cursor.close()
+                applied += 1
+            except Exception as e:
+                logger.error(f"Sqlite: dropping buffered write {query!r}: {e}")
+        await self.conn.commit()
+
+        logger.debug(f"Sqlite: flushed {applied}/{len(buffer)} buffered writes")
+        return applied
+
+    async def _flush_loop(self) -> None:
+        assert self._flush_event is not None
+
+        while True:
+            try:
+                await asyncio.wait_for(
+                    self._flush_event.wait(),
+                    timeout=self._flush_interval,
+                )
+            except asyncio.TimeoutError:
+                pass
+
+            self._flush_event.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Failed to flush buffered sqlite writes: {e}")
 
     async def fetch_one(self, query: str, args: tuple = ()) -> Optional[tuple]:
         if not self.conn:
@@ -45,7 +143,8 @@ class Sqlite:
 
         cursor = await self.conn.execute(query, args)
         rows = await cursor.fetchall()
-        logger.debug(f"Sqlite: {rows!r}, {query!r}, {args!r}")
+        # Only the row count is logged; formatting every row is expensive.
+        logger.debug(f"Sqlite: {len(rows)} rows, {query!r}, {args!r}")
         await cursor.close()
         return rows
 
@@ -57,12 +156,22 @@ class Sqlite:
         val = await cursor.fetchone()
         logger.debug(f"Sqlite: {val!r}, {query!r}, {args!r}")
         await cursor.close()
-        
+
         if val is None:
             return None
 
         return val[0]
 
     async def close(self):
+        if self._flush_task:
+            # Let a flush that was mid-batch put its writes back before the final one.
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+
         if self.conn:
-            await self.conn.close()
\ No newline at end of file
+            await self.flush()
+            await self.conn.close()
@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import re
+import time
+from typing import Any
+
+# Upper bounds (in milliseconds) of the latency histogram buckets. The final
+# bucket catches everything slower than the last bound.
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# Hard cap on tracked shapes so a stray unparameterised query cannot grow this forever.
+MAX_QUERY_SHAPES = 1024
+
+_STRING_LITERAL_RE = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBER_LITERAL_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\bIN\s*\((?:\s*(?:\?|%s)\s*,?)+\)", re.IGNORECASE)
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalise_query(query: str) -> str:
+    """Reduces a query to its shape, replacing literals with placeholders so that
+    calls differing only in inlined values are grouped together."""
+
+    shape = _STRING_LITERAL_RE.sub("?", query)
+    shape = _NUMBER_LITERAL_RE.sub("?", shape)
+    shape = _IN_LIST_RE.sub("IN (...)", shape)
+    return _WHITESPACE_RE.sub(" ", shape).strip()
+
+
+class QueryShapeStats:
+    """Aggregated timings for a single normalised query shape."""
+
+    __slots__ = (
+        "shape",
+        "calls",
+        "rows",
+        "total_ms",
+        "max_ms",
+        "acquire_total_ms",
+        "acquire_max_ms",
+        "buckets",
+    )
+
+    def __init__(self, shape: str) -> None:
+        self.shape = shape
+        self.calls = 0
+        self.rows = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.acquire_total_ms = 0.0
+        self.acquire_max_ms = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def record(self, latency_ms: float, acquire_ms: float, rows: int) -> None:
+        self.calls += 1
+        self.rows += rows
+        self.total_ms += latency_ms
+        self.acquire_total_ms += acquire_ms
+
+        if latency_ms > self.max_ms:
+            self.max_ms = latency_ms
+        if acquire_ms > self.acquire_max_ms:
+            self.acquire_max_ms = acquire_ms
+
+        for idx, bound in enumerate(LATENCY_BUCKETS_MS):
+            if latency_ms <= bound:
+                self.buckets[idx] += 1
+                return
+        self.buckets[-1] += 1
+
+    def percentile(self, percentile: float) -> float:
+        """Estimates a latency percentile (in ms) from the histogram buckets."""
+
+        if not self.calls:
+            return 0.0
+
+        target = self.calls * percentile / 100
+        seen = 0
+        for idx, count in enumerate(self.buckets):
+            seen += count
+            if seen >= target:
+                if idx < len(LATENCY_BUCKETS_MS):
+                    return float(LATENCY_BUCKETS_MS[idx])
+                break
+
+        return self.max_ms
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "query": self.shape,
+            "calls": self.calls,
+            "rows": self.rows,
+            "avg_rows": round(self.rows / self.calls, 2) if self.calls else 0,
+            "total_ms": round(self.total_ms, 3),
+            "avg_ms": round(self.total_ms / self.calls, 3) if self.calls else 0,
+            "max_ms": round(self.max_ms, 3),
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99),
+            "acquire_avg_ms": (
+                round(self.acquire_total_ms / self.calls, 3) if self.calls else 0
+            ),
+            "acquire_max_ms": round(self.acquire_max_ms, 3),
+            "histogram": {
+                **{
+                    f"<={bound}ms": count
+                    for bound, count in zip(LATENCY_BUCKETS_MS, self.buckets)
+                },
+                f">{LATENCY_BUCKETS_MS[-1]}ms": self.buckets[-1],
+            },
+        }
+
+
+class QueryTimer:
+    """Measures a single database call. Create it before acquiring a connection,
+    call `acquired` once one has been handed out and `finish` when done."""
+
+    __slots__ = ("_stats", "_query", "_started_at", "_acquired_at")
+
+    def __init__(self, stats: QueryStatistics, query: str) -> None:
+        self._stats = stats
+        self._query = query
+        self._started_at = time.perf_counter()
+        self._acquired_at = self._started_at
+
+    def acquired(self) -> None:
+        self._acquired_at = time.perf_counter()
+
+    def finish(self, rows: int) -> None:
+        finished_at = time.perf_counter()
+        self._stats.record(
+            self._query,
+            (finished_at - self._acquired_at) * 1000,
+            (self._acquired_at - self._started_at) * 1000,
+            rows,
+        )
+
+
+class QueryStatistics:
+    """In-process latency, row count and connection acquire-wait statistics,
+    grouped by normalised query shape."""
+
+    def __init__(self) -> None:
+        self._shapes: dict[str, QueryShapeStats] = {}
+        self._shape_cache: dict[str, str] = {}
+        self.started_at = time.time()
+
+    def timer(self, query: str) -> QueryTimer:
+        return QueryTimer(self, query)
+
+    def _shape_of(self, query: str) -> str:
+        shape = self._shape_cache.get(query)
+        if shape is None:
+            shape = normalise_query(query)
+            if len(self._shape_cache) < MAX_QUERY_SHAPES * 4:
+                self._shape_cache[query] = shape
+        return shape
+
+    def record(
+        self,
+        query: str,
+        latency_ms: float,
+        acquire_ms: float,
+        rows: int,
+    ) -> None:
+        shape = self._shape_of(query)
+        shape_stats = self._shapes.get(shape)
+        if shape_stats is None:
+            if len(self._shapes) >= MAX_QUERY_SHAPES:
+                shape = "<other>"
+                shape_stats = self._shapes.get(shape)
+            if shape_stats is None:
+                shape_stats = self._shapes[shape] = QueryShapeStats(shape)
+
+        shape_stats.record(latency_ms, acquire_ms, rows)
+
+    def reset(self) -> None:
+        self._shapes.clear()
+        self.started_at = time.time()
+
+    def snapshot(self, sort_by: str = "total_ms", limit: int = 50) -> dict[str, Any]:
+        """Returns the statistics for the slowest shapes, ordered by `sort_by`."""
+
+        shapes = [shape.as_dict() for shape in self._shapes.values()]
+        shapes.sort(key=lambda shape: shape.get(sort_by, 0), reverse=True)
+
+        return {
+            "since": int(self.started_at),
+            "total_calls": sum(shape["calls"] for shape in shapes),
+            "total_ms": round(sum(shape["total_ms"] for shape in shapes), 3),
+            "queries": shapes[:limit],
+        }
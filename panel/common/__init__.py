@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 from . import cryprography
+from . import ring_buffer
 from . import threads
 from . import time
 from . import utils
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+from array import array
+
+
+class IntRingBuffer:
+    """A fixed capacity buffer of integers backed by a flat array. Once full, new
+    values overwrite the oldest ones."""
+
+    __slots__ = ("_data", "_start", "_size")
+
+    def __init__(self, capacity: int) -> None:
+        self._data = array("q", [0] * capacity)
+        self._start = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def capacity(self) -> int:
+        return len(self._data)
+
+    def append(self, value: int) -> None:
+        end = (self._start + self._size) % self.capacity
+        self._data[end] = value
+
+        if self._size < self.capacity:
+            self._size += 1
+        else:
+            self._start = (self._start + 1) % self.capacity
+
+    def set_last(self, value: int) -> None:
+        """Overwrites the newest value (appending if empty)."""
+        if not self._size:
+            self.append(value)
+            return
+
+        self._data[(self._start + self._size - 1) % self.capacity] = value
+
+    def to_list(self) -> list[int]:
+        """Returns the values from oldest to newest."""
+        end = self._start + self._size
+        if end <= self.capacity:
+            return self._data[self._start : end].tolist()
+
+        return (
+            self._data[self._start :].tolist()
+            + self._data[: end - self.capacity].tolist()
+        )
@@ -20,6 +20,14 @@ class Config:
     sql_user: str = "rosu"
     sql_password: str = ""
     sql_database: str = "rosu"
+    sql_pool_min_size: int = 1
+    sql_pool_max_size: int = 10
+    sql_pool_recycle: int = 3600
+    sql_pool_warmup: int = 5
+    sql_replica_host: str = ""
+    sql_replica_port: int = 3306
+    sql_replica_user: str = ""
+    sql_replica_password: str = ""
     redis_host: str = "localhost"
     redis_port: int = 6379
     redis_db: int = 0
@@ -33,6 +41,9 @@ class Config:
     api_performance_url: str = "https://performance.ussr.pl"
     api_avatar_url: str = "https://a.ussr.pl"
     api_bancho_url: str = "https://c.ussr.pl"
+    api_pool_limit: int = 100
+    api_pool_limit_per_host: int = 20
+    api_timeout: int = 10
     webhook_ranked: str = ""
     webhook_admin_log: str = ""
     avatars_path: str = ""
@@ -10,7 +10,11 @@ import random
 import string
 import time
 import os
+from collections import OrderedDict
+from collections import deque
+from contextlib import asynccontextmanager
 from typing import Any
+from typing import AsyncIterator
 from typing import cast
 from typing import NamedTuple
 from typing import Optional
@@ -24,10 +28,12 @@ import pycountry
 import timeago
 
 if TYPE_CHECKING:
+    from panel.adapters.mysql import MySQLTransaction
     from panel.web.sessions import Session
 
 from panel import logger
 from panel.common.cryprography import compare_password
+from panel.common.ring_buffer import IntRingBuffer
 from panel.common.time import timestamp_as_date
 from panel.common.utils import decode_int_or
 from panel import state
@@ -57,7 +63,7 @@ async def fix_bad_user_count() -> None:
 
 
 # public variables
-PlayerCount = [0] * 10  # list of players with baseline
+PlayerCount = IntRingBuffer(100)  # 5 minute averages, oldest first
 
 
 class Country(TypedDict):
@@ -83,8 +89,9 @@ async def log_traceback(
     session: Session,
     traceback_type: TracebackType,
 ) -> None:
-    """Logs a traceback to the database."""
-    await state.sqlite.execute(
+    """Logs a traceback to the database. The write is buffered, so it does not hold
+    up the failing request."""
+    state.sqlite.execute_buffered(
         "INSERT INTO tracebacks (user_id, traceback, time, traceback_type) VALUES (?, ?, ?, ?)",
         (
             session.user_id,
@@ -97,17 +104,20 @@ async def log_traceback(
 
 async def get_tracebacks(page: int = 0) -> list[dict[str, Any]]:
     """Gets all tracebacks."""
+    # Make sure recently logged tracebacks are visible.
+    await state.sqlite.flush()
     tracebacks = await state.sqlite.fetch_all(
         "SELECT user_id, traceback, time, traceback_type FROM "
         f"tracebacks ORDER BY time DESC LIMIT {PAGE_SIZE} OFFSET {PAGE_SIZE * page}",
     )
 
+    users = await GetUsers([traceback[0] for traceback in tracebacks])
+
     resp_list = []
     for traceback in tracebacks:
-        user = await GetUser(traceback[0])
         resp_list.append(
             {
-                "user": user,
+                "user": users[traceback[0]],
                 "traceback": traceback[1],
                 "time": timestamp_as_date(traceback[2], False),
                 "traceback_type": traceback[3],
@@ -117,17 +127,48 @@ async def get_tracebacks(page: int = 0) -> list[dict[str, Any]]:
     return resp_list
 
 
+# How long (in seconds) the dashboard header values are reused between page loads.
+DASHBOARD_CACHE_TTL = 5
+
+_dashboard_cache: Optional[dict[str, Any]] = None
+_dashboard_cache_expire = 0.0
+
+
+def invalidate_dashboard_data() -> None:
+    """Forces the dashboard header values to be refetched on next use."""
+    global _dashboard_cache_expire
+
+    _dashboard_cache_expire = 0.0
+
+
 async def load_dashboard_data() -> dict[str, Any]:
-    """Grabs all the values for the dashboard."""
+    """Grabs all the values for the dashboard. These are cached for
+    `DASHBOARD_CACHE_TTL` seconds as they are rendered on every page."""
+    global _dashboard_cache, _dashboard_cache_expire
+
+    if _dashboard_cache is not None and _dashboard_cache_expire > time.time():
+        return _dashboard_cache
+
     alert = await state.database.fetch_val(
         "SELECT value_string FROM system_settings WHERE name = 'website_global_alert'",
     )
 
-    total_pp = decode_int_or(await state.redis.get("ripple:total_pp"))
-    registered_users = decode_int_or(await state.redis.get("ripple:registered_users"))
-    online_users = decode_int_or(await state.redis.get("ripple:online_users"))
-    total_plays = decode_int_or(await state.redis.get("ripple:total_plays"))
-    total_scores = decode_int_or(await state.redis.get("ripple:total_submitted_scores"))
+    (
+        total_pp,
+        registered_users,
+        online_users,
+        total_plays,
+        total_scores,
+    ) = map(
+        decode_int_or,
+        await state.redis.mget(
+            "ripple:total_pp",
+            "ripple:registered_users",
+            "ripple:online_users",
+            "ripple:total_plays",
+            "ripple:total_submitted_scores",
+        ),
+    )
 
     response = {
         "RegisteredUsers": registered_users,
@@ -137,6 +178,9 @@ async def load_dashboard_data() -> dict[str, Any]:
         "TotalScores": f"{total_scores:,}",
         "Alert": alert,
     }
+
+    _dashboard_cache = response
+    _dashboard_cache_expire = time.time() + DASHBOARD_CACHE_TTL
     return response
 
 
@@ -181,10 +225,7 @@ async def LoginHandler(
         if await has_privilege_value(user_id, Privileges.ADMIN_ACCESS_RAP):
             if compare_password(password, password_md5):
                 # Get privilege name
-                priv_name = await state.database.fetch_val(
-                    "SELECT name FROM privileges_groups WHERE privileges = %s",
-                    (privileges,),
-                )
+                priv_name = await get_privilege_group_name(privileges)
                 if not priv_name:
                     priv_name = "Unknown Group"
 
@@ -201,16 +242,66 @@ async def LoginHandler(
 BASE_RECENT_QUERY = """
 SELECT
     u.username, s.userid, s.time, s.score, s.pp,
-    s.play_mode, s.mods, s.accuracy, b.song_name, s.play_mode
+    s.play_mode, s.mods, s.accuracy, b.song_name, s.play_mode, s.id
 FROM {} s
 INNER JOIN users u ON u.id = s.userid
 INNER JOIN beatmaps b ON b.beatmap_md5 = s.beatmap_md5
 WHERE
-    u.privileges & 1 AND s.pp >= %s
+    u.privileges & 1 AND s.pp >= %s AND s.id > %s
 ORDER BY s.id DESC
 LIMIT %s
 """
 
+# How many (table, minimum pp, limit) combinations of recent plays are kept, and
+# how often (in seconds) each is fully refetched so plays removed or hidden behind
+# our back (eg. restrictions by bancho) drop out.
+RECENT_PLAYS_CACHE_SIZE = 16
+RECENT_PLAYS_REFETCH_INTERVAL = 300
+
+# (table, minimum_pp, limit) -> (fetched_at, the latest plays, highest id first)
+_recent_plays_cache: OrderedDict[
+    tuple[str, int, int],
+    tuple[float, list[tuple]],
+] = OrderedDict()
+
+
+def invalidate_recent_plays() -> None:
+    """Drops all cached recent plays, eg. after a user's scores are hidden or
+    deleted."""
+    _recent_plays_cache.clear()
+
+
+async def _fetch_recent_table_plays(
+    table: str,
+    minimum_pp: int,
+    limit: int,
+) -> list[tuple]:
+    """Fetches the latest plays from a scores table. Only plays newer than the
+    ones already cached are queried for."""
+    key = (table, minimum_pp, limit)
+    now = time.time()
+    fetched_at, cached = _recent_plays_cache.get(key, (now, []))
+    if now - fetched_at >= RECENT_PLAYS_REFETCH_INTERVAL:
+        fetched_at, cached = now, []
+    high_water_mark = cached[0][10] if cached else 0
+
+    new_plays = await state.database.fetch_all(
+        BASE_RECENT_QUERY.format(table),
+        (
+            minimum_pp,
+            high_water_mark,
+            limit,
+        ),
+    )
+    plays = (list(new_plays) + cached)[:limit]
+
+    _recent_plays_cache[key] = (fetched_at, plays)
+    _recent_plays_cache.move_to_end(key)
+    while len(_recent_plays_cache) > RECENT_PLAYS_CACHE_SIZE:
+        _recent_plays_cache.popitem(last=False)
+
+    return plays
+
 
 async def get_recent_plays(
     total_plays: int = 20,
@@ -224,42 +315,27 @@ async def get_recent_plays(
         divisor += 1
     plays_per_gamemode = total_plays // divisor
 
-    dash_plays = []
+    tables = ["scores"]
+    if config.srv_supports_relax:
+        tables.append("scores_relax")
+    if config.srv_supports_autopilot:
+        tables.append("scores_ap")
 
-    plays = await state.database.fetch_all(
-        BASE_RECENT_QUERY.format("scores"),
-        (
-            minimum_pp,
-            plays_per_gamemode,
+    table_plays = await asyncio.gather(
+        *(
+            _fetch_recent_table_plays(table, minimum_pp, plays_per_gamemode)
+            for table in tables
         ),
     )
-    dash_plays.extend(plays)
-
-    if config.srv_supports_relax:
-        # adding relax plays
-        plays_rx = await state.database.fetch_all(
-            BASE_RECENT_QUERY.format("scores_relax"),
-            (
-                minimum_pp,
-                plays_per_gamemode,
-            ),
-        )
-        dash_plays.extend(plays_rx)
-
-    if config.srv_supports_autopilot:
-        # adding autopilot plays
-        plays_ap = await state.database.fetch_all(
-            BASE_RECENT_QUERY.format("scores_ap"),
-            (
-                minimum_pp,
-                plays_per_gamemode,
-            ),
-        )
-        dash_plays.extend(plays_ap)
+    dash_plays = [
+        (table, play) for table, plays in zip(tables, table_plays) for play in plays
+    ]
+    # newest first across all of the tables
+    dash_plays.sort(key=lambda play: int(play[1][2]), reverse=True)
 
     # converting the data into something readable
     ReadableArray = []
-    for x in dash_plays:
+    for table, x in dash_plays:
         # yes im doing this
         # lets get the song name
         SongName = x[8]
@@ -278,11 +354,73 @@ async def get_recent_plays(
         Dicti["Time"] = timestamp_as_date(int(x[2]))
         Dicti["Accuracy"] = round(x[7], 2)
         Dicti["Mode"] = convert_mode_to_str(x[9])
+        Dicti["ScoreId"] = x[10]
+        Dicti["ScoreTable"] = table
         ReadableArray.append(Dicti)
 
     return ReadableArray
 
 
+# How often (in seconds) recent plays are polled for the live feed, and how many
+# undelivered updates a slow client may have queued before they are dropped.
+LIVE_PLAYS_INTERVAL = 5
+LIVE_PLAYS_QUEUE_SIZE = 50
+
+_live_plays_subscribers: set[asyncio.Queue[list[dict[str, Any]]]] = set()
+
+
+@asynccontextmanager
+async def subscribe_live_plays() -> (
+    AsyncIterator[asyncio.Queue[list[dict[str, Any]]]]
+):
+    """Registers a listener for the live plays feed. Each batch of new plays
+    (newest first) is put on the yielded queue."""
+    queue: asyncio.Queue[list[dict[str, Any]]] = asyncio.Queue(LIVE_PLAYS_QUEUE_SIZE)
+    _live_plays_subscribers.add(queue)
+    try:
+        yield queue
+    finally:
+        _live_plays_subscribers.discard(queue)
+
+
+def _play_key(play: dict[str, Any]) -> tuple:
+    # Score ids are only unique within their own table.
+    return (play["ScoreTable"], play["ScoreId"])
+
+
+async def LivePlaysCollection() -> None:
+    """Designed to be ran as a background task. Polls for new plays while anyone is
+    watching the live feed, fanning them out to every listener."""
+    seen: Optional[set[tuple]] = None
+    while True:
+        if not _live_plays_subscribers:
+            # Whoever subscribes next loads the page fresh, so start over rather
+            # than pushing them plays from before they arrived.
+            seen = None
+        else:
+            try:
+                plays = await get_recent_plays()
+                keys = {_play_key(play) for play in plays}
+
+                # The first poll only primes what has been seen; listeners already
+                # have these from the page they loaded.
+                new_plays = []
+                if seen is not None:
+                    new_plays = [play for play in plays if _play_key(play) not in seen]
+                seen = keys
+
+                if new_plays:
+                    for queue in list(_live_plays_subscribers):
+                        try:
+                            queue.put_nowait(new_plays)
+                        except asyncio.QueueFull:
+                            pass
+            except Exception as e:
+                logger.error(f"Failed to poll live plays: {e}")
+
+        await asyncio.sleep(LIVE_PLAYS_INTERVAL)
+
+
 async def FetchBSData() -> dict:
     """Fetches Bancho Settings."""
     bancho_settings = await state.database.fetch_all(
@@ -310,30 +448,44 @@ async def handle_bancho_settings_edit(
     bancho_maintenence_bool = bancho_maintenence == "On"
 
     # SQL Queries
+    statements = []
     if menu_icon:
-        await state.database.execute(
-            "UPDATE bancho_settings SET value_string = %s, value_int = 1 WHERE name = 'menu_icon'",
-            (menu_icon,),
+        statements.append(
+            (
+                "UPDATE bancho_settings SET value_string = %s, value_int = 1 WHERE name = 'menu_icon'",
+                (menu_icon,),
+            ),
         )
     else:
-        await state.database.execute(
-            "UPDATE bancho_settings SET value_string = '', value_int = 0 WHERE name = 'menu_icon'",
+        statements.append(
+            (
+                "UPDATE bancho_settings SET value_string = '', value_int = 0 WHERE name = 'menu_icon'",
+                (),
+            ),
         )
 
     if login_notification:
-        await state.database.execute(
-            "UPDATE bancho_settings SET value_string = %s, value_int = 1 WHERE name = 'login_notification'",
-            (login_notification,),
+        statements.append(
+            (
+                "UPDATE bancho_settings SET value_string = %s, value_int = 1 WHERE name = 'login_notification'",
+                (login_notification,),
+            ),
         )
     else:
-        await state.database.execute(
-            "UPDATE bancho_settings SET value_string = '', value_int = 0 WHERE name = 'login_notification'",
+        statements.append(
+            (
+                "UPDATE bancho_settings SET value_string = '', value_int = 0 WHERE name = 'login_notification'",
+                (),
+            ),
         )
 
-    await state.database.execute(
-        "UPDATE bancho_settings SET value_int = %s WHERE name = 'bancho_maintenance'",
-        (int(bancho_maintenence_bool),),
+    statements.append(
+        (
+            "UPDATE bancho_settings SET value_int = %s WHERE name = 'bancho_maintenance'",
+            (int(bancho_maintenence_bool),),
+        ),
     )
+    await state.database.execute_batch(statements)
 
     await RAPLog(user_id, "modified the bancho settings")
 
@@ -341,6 +493,58 @@ async def handle_bancho_settings_edit(
 import re
 
 
+async def get_cached_star_ratings(
+    maps: list[tuple[str, int]],
+) -> dict[tuple[str, int], float]:
+    """Looks up stored nomod star ratings by (beatmap_md5, mode)."""
+    if not maps:
+        return {}
+
+    md5s = list({beatmap_md5 for beatmap_md5, _ in maps})
+    condition = ", ".join(["?"] * len(md5s))
+    rows = await state.sqlite.fetch_all(
+        f"SELECT beatmap_md5, mode, stars FROM star_ratings WHERE beatmap_md5 IN ({condition})",
+        tuple(md5s),
+    )
+
+    wanted = set(maps)
+    return {
+        (beatmap_md5, mode): stars
+        for beatmap_md5, mode, stars in rows
+        if (beatmap_md5, mode) in wanted
+    }
+
+
+async def fetch_star_ratings(payload: list[dict[str, Any]]) -> dict[int, float]:
+    """Calculates star ratings through the performance API in one batched call,
+    storing them for future lookups. Returns them keyed by beatmap id."""
+    star_ratings = {}
+    try:
+        async with state.http.post(
+            config.api_performance_url + "/api/v1/calculate", json=payload
+        ) as resp:
+            if resp.status == 200:
+                api_results = await resp.json()
+                # Map results back to beatmap_id for easy lookup
+                if isinstance(api_results, list) and len(api_results) == len(payload):
+                    for i, result in enumerate(api_results):
+                        # result is expected to have 'stars' key
+                        stars = result.get("stars")
+                        if stars:
+                            star_ratings[payload[i]["beatmap_id"]] = stars
+                            state.sqlite.execute_buffered(
+                                "INSERT OR REPLACE INTO star_ratings (beatmap_md5, mode, stars) "
+                                "VALUES (?, ?, ?)",
+                                (payload[i]["beatmap_md5"], payload[i]["mode"], stars),
+                            )
+            else:
+                logger.warning(f"Performance API returned status {resp.status}")
+    except Exception as e:
+        logger.error(f"Failed to fetch star ratings from API: {e}")
+
+    return star_ratings
+
+
 async def GetBmapInfo(
     bmap_id: int, user_id: Optional[int] = None
 ) -> list[dict[str, Any]]:
@@ -401,9 +605,23 @@ async def GetBmapInfo(
                 beatmap for beatmap in beatmaps_data if beatmap[7] in rankable_modes
             ]
 
+    # Star ratings never change for a given map version, so only ask the API about
+    # the ones we haven't stored yet.
+    cached_stars = await get_cached_star_ratings(
+        [(beatmap[6], beatmap[7]) for beatmap in beatmaps_data],
+    )
+    star_ratings = {
+        beatmap[4]: cached_stars[(beatmap[6], beatmap[7])]
+        for beatmap in beatmaps_data
+        if (beatmap[6], beatmap[7]) in cached_stars
+    }
+
     # Prepare payload for star rating calculation
     payload = []
     for beatmap in beatmaps_data:
+        if beatmap[4] in star_ratings:
+            continue
+
         payload.append(
             {
                 "beatmap_id": beatmap[4],
@@ -417,27 +635,8 @@ async def GetBmapInfo(
         )
 
     # Fetch star ratings from API
-    star_ratings = {}
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                config.api_performance_url + "/api/v1/calculate", json=payload
-            ) as resp:
-                if resp.status == 200:
-                    api_results = await resp.json()
-                    # Map results back to beatmap_id for easy lookup
-                    if isinstance(api_results, list) and len(api_results) == len(
-                        payload
-                    ):
-                        for i, result in enumerate(api_results):
-                            # result is expected to have 'stars' key
-                            stars = result.get("stars")
-                            if stars:
-                                star_ratings[payload[i]["beatmap_id"]] = stars
-                else:
-                    logger.warning(f"Performance API returned status {resp.status}")
-    except Exception as e:
-        logger.error(f"Failed to fetch star ratings from API: {e}")
+    if payload:
+        star_ratings.update(await fetch_star_ratings(payload))
 
     BeatmapList = []
     for beatmap in beatmaps_data:
@@ -475,12 +674,91 @@ async def GetBmapInfo(
     return BeatmapList
 
 
-async def has_privilege_value(user_id: int, privilege: Privileges) -> bool:
-    # Fetch privileges from database.
+# How long (in seconds) a user's privileges are cached for. Changes made through the
+# panel or bancho are picked up sooner through the refresh channels below.
+PRIVILEGE_CACHE_TTL = 30
+PRIVILEGE_REFRESH_CHANNELS = ("peppy:refresh_privs", "peppy:ban")
+
+# user_id -> (expires_at, privileges)
+_privilege_cache: dict[int, tuple[float, Optional[int]]] = {}
+
+
+def invalidate_cached_privileges(user_id: Optional[int] = None) -> None:
+    """Drops the cached privileges of `user_id`, or of everyone if not given."""
+
+    if user_id is None:
+        _privilege_cache.clear()
+    else:
+        _privilege_cache.pop(user_id, None)
+
+
+async def get_user_privileges(user_id: int) -> Optional[int]:
+    """Fetches the raw privileges value of a user, served from an in-process cache
+    for up to `PRIVILEGE_CACHE_TTL` seconds."""
+
+    cached = _privilege_cache.get(user_id)
+    if cached is not None and cached[0] > time.time():
+        return cached[1]
+
+    # Read from the primary so that a cache miss never sees a stale replica.
     privileges = await state.database.fetch_val(
         "SELECT privileges FROM users WHERE id = %s",
         (user_id,),
+        primary=True,
     )
+    _privilege_cache[user_id] = (time.time() + PRIVILEGE_CACHE_TTL, privileges)
+    return privileges
+
+
+def _refreshed_user_id(channel: str, data: str) -> Optional[int]:
+    """Parses the user id out of a privilege refresh message."""
+
+    try:
+        if channel == "peppy:refresh_privs":
+            data = json.loads(data)["user_id"]
+        return int(data)
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+async def PrivilegeRefreshListener() -> None:
+    """Designed to be ran as a background task. Drops cached privileges whenever
+    bancho is told to refresh or ban a user."""
+    while True:
+        pubsub = state.redis.pubsub()
+        try:
+            await pubsub.subscribe(*PRIVILEGE_REFRESH_CHANNELS)
+            async for message in pubsub.listen():
+                if message["type"] != "message":
+                    continue
+
+                channel = message["channel"]
+                data = message["data"]
+                if isinstance(channel, bytes):
+                    channel = channel.decode()
+                if isinstance(data, bytes):
+                    data = data.decode()
+
+                user_id = _refreshed_user_id(channel, data)
+                # If we can't tell who changed, play it safe and drop everyone.
+                invalidate_cached_privileges(user_id)
+                if channel == "peppy:ban":
+                    invalidate_recent_plays()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Privilege refresh listener failed: {e}")
+        finally:
+            await pubsub.reset()
+
+        # Anything published while we were disconnected has been missed.
+        invalidate_cached_privileges()
+        invalidate_recent_plays()
+        await asyncio.sleep(5)
+
+
+async def has_privilege_value(user_id: int, privilege: Privileges) -> bool:
+    privileges = await get_user_privileges(user_id)
 
     if privileges is None:
         return False
@@ -542,6 +820,7 @@ async def RankBeatmap(BeatmapId: int, ActionName: str, session: Session) -> None
             BeatmapId,
         ),
     )
+    await update_suggested_rank([BeatmapId], ActionId)
     await Webhook(BeatmapId, ActionId, session)
 
     # USSR SUPPORT.
@@ -552,27 +831,28 @@ async def RankBeatmap(BeatmapId: int, ActionName: str, session: Session) -> None
     )
 
     if map_md5:
+        invalidate_beatmapset_by_md5(map_md5)
         await refresh_bmap(map_md5)
 
 
 async def send_discord_webhook(url: str, content: dict[str, Any]) -> None:
     """Async wrapper to send discord webhook"""
-    async with aiohttp.ClientSession() as session:
-        try:
-            await session.post(url, json=content)
-        except Exception as e:
-            logger.error(f"Failed to send webhook: {e}")
+    try:
+        async with state.http.post(url, json=content):
+            pass
+    except Exception as e:
+        logger.error(f"Failed to send webhook: {e}")
 
 
 async def FokaMessage(params: dict[str, Any]) -> None:
     """Sends a fokabot message."""
-    async with aiohttp.ClientSession() as session:
-        try:
-            await session.get(
-                config.api_bancho_url + "/api/v1/fokabotMessage", params=params
-            )
-        except Exception as e:
-            logger.error(f"Failed to send fokabot message: {e}")
+    try:
+        async with state.http.get(
+            config.api_bancho_url + "/api/v1/fokabotMessage", params=params
+        ):
+            pass
+    except Exception as e:
+        logger.error(f"Failed to send fokabot message: {e}")
 
 
 async def Webhook(BeatmapId: int, ActionId: int, session: Session) -> None:
@@ -694,92 +974,197 @@ async def ApplySystemSettings(DataArray: list[str], user_id: int) -> None:
         Register = 0
 
     # SQL Queries
-    await state.database.execute(
-        "UPDATE system_settings SET value_int = %s WHERE name = 'website_maintenance'",
-        (WebMan,),
-    )
-    await state.database.execute(
-        "UPDATE system_settings SET value_int = %s WHERE name = 'game_maintenance'",
-        (GameMan,),
-    )
-    await state.database.execute(
-        "UPDATE system_settings SET value_int = %s WHERE name = 'registrations_enabled'",
-        (Register,),
-    )
+    statements = [
+        (
+            "UPDATE system_settings SET value_int = %s WHERE name = 'website_maintenance'",
+            (WebMan,),
+        ),
+        (
+            "UPDATE system_settings SET value_int = %s WHERE name = 'game_maintenance'",
+            (GameMan,),
+        ),
+        (
+            "UPDATE system_settings SET value_int = %s WHERE name = 'registrations_enabled'",
+            (Register,),
+        ),
+    ]
 
     # if empty, disable
     if GlobalAlert != "":
-        await state.database.execute(
-            "UPDATE system_settings SET value_int = 1, value_string = %s WHERE name = 'website_global_alert'",
-            (GlobalAlert,),
+        statements.append(
+            (
+                "UPDATE system_settings SET value_int = 1, value_string = %s WHERE name = 'website_global_alert'",
+                (GlobalAlert,),
+            ),
         )
     else:
-        await state.database.execute(
-            "UPDATE system_settings SET value_int = 0, value_string = '' WHERE name = 'website_global_alert'",
+        statements.append(
+            (
+                "UPDATE system_settings SET value_int = 0, value_string = '' WHERE name = 'website_global_alert'",
+                (),
+            ),
         )
     if HomeAlert != "":
-        await state.database.execute(
-            "UPDATE system_settings SET value_int = 1, value_string = %s WHERE name = 'website_home_alert'",
-            (HomeAlert,),
+        statements.append(
+            (
+                "UPDATE system_settings SET value_int = 1, value_string = %s WHERE name = 'website_home_alert'",
+                (HomeAlert,),
+            ),
         )
     else:
-        await state.database.execute(
-            "UPDATE system_settings SET value_int = 0, value_string = '' WHERE name = 'website_home_alert'",
+        statements.append(
+            (
+                "UPDATE system_settings SET value_int = 0, value_string = '' WHERE name = 'website_home_alert'",
+                (),
+            ),
         )
 
+    await state.database.execute_batch(statements)
+    invalidate_dashboard_data()
+
     await RAPLog(user_id, "updated the system settings.")
 
 
-async def IsOnline(AccountId: int) -> bool:
-    """Checks if given user is online."""
+# How long (in seconds) a user's online status is reused for.
+ONLINE_STATUS_CACHE_TTL = 10
+ONLINE_STATUS_UNKNOWN_TTL = 2
+# How long (in seconds) to wait on bancho before reporting a status as unknown.
+ONLINE_STATUS_TIMEOUT = aiohttp.ClientTimeout(total=1.5)
+
+# user_id -> (expires_at, online or None if unknown)
+_online_status_cache: dict[int, tuple[float, Optional[bool]]] = {}
+
+
+async def _fetch_online_status(user_id: int) -> Optional[bool]:
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                f"{config.api_bancho_url}/api/status/{AccountId}"
-            ) as resp:
-                return resp.status == 200
+        async with state.http.get(
+            f"{config.api_bancho_url}/api/status/{user_id}",
+            timeout=ONLINE_STATUS_TIMEOUT,
+        ) as resp:
+            return resp.status == 200
     except Exception:
-        return False
+        return None
+
+
+async def GetOnlineStatuses(user_ids: list[int]) -> dict[int, Optional[bool]]:
+    """Checks which of the given users are online. Users bancho did not answer for
+    in time are reported as `None` (unknown)."""
+    now = time.time()
+    statuses: dict[int, Optional[bool]] = {}
+    missing = []
+    for user_id in dict.fromkeys(user_ids):
+        cached = _online_status_cache.get(user_id)
+        if cached is not None and cached[0] > now:
+            statuses[user_id] = cached[1]
+        else:
+            missing.append(user_id)
+
+    if not missing:
+        return statuses
+
+    # Concurrency towards bancho is bounded by the shared session's per-host limit.
+    results = await asyncio.gather(
+        *(_fetch_online_status(user_id) for user_id in missing),
+    )
+
+    # Drop anything expired so the cache doesn't outgrow the active user base.
+    for user_id, (expires_at, _) in list(_online_status_cache.items()):
+        if expires_at <= now:
+            del _online_status_cache[user_id]
+
+    for user_id, online in zip(missing, results):
+        statuses[user_id] = online
+        # Unknown results are only kept briefly so bancho is retried soon.
+        ttl = (
+            ONLINE_STATUS_CACHE_TTL if online is not None else ONLINE_STATUS_UNKNOWN_TTL
+        )
+        _online_status_cache[user_id] = (now + ttl, online)
+
+    return statuses
+
+
+async def IsOnline(AccountId: int) -> Optional[bool]:
+    """Checks if given user is online (`None` if unknown)."""
+    return (await GetOnlineStatuses([AccountId]))[AccountId]
+
+
+# How long (in seconds) a PP calculation is reused for, and how many are kept.
+PP_CACHE_TTL = 600
+PP_CACHE_MAX_SIZE = 512
+
+# (beatmap_id, mods) -> (expires_at, pp), least recently used first.
+_pp_cache: OrderedDict[tuple[int, int], tuple[float, float]] = OrderedDict()
+# Calculations currently in progress, shared by everyone asking for the same one.
+_pp_in_flight: dict[tuple[int, int], asyncio.Task[float]] = {}
+
+
+async def _request_pp(BmapID: int, mods: int) -> float:
+    url = f"{config.api_ussr_url}api/v1/pp?b={BmapID}"
+    if mods:
+        url += f"&m={mods}"
+
+    async with state.http.get(url) as resp:
+        reqjson = await resp.json()
+        return round(reqjson["pp"][0], 2)
+
+
+def _on_pp_calculated(key: tuple[int, int], task: asyncio.Task[float]) -> None:
+    _pp_in_flight.pop(key, None)
+
+    # Failures are not cached so the next request retries.
+    if task.cancelled() or task.exception() is not None:
+        return
+
+    _pp_cache[key] = (time.time() + PP_CACHE_TTL, task.result())
+    _pp_cache.move_to_end(key)
+    while len(_pp_cache) > PP_CACHE_MAX_SIZE:
+        _pp_cache.popitem(last=False)
+
+
+async def CalcPPMods(BmapID: int, mods: int = 0) -> float:
+    """Sends request to USSR to calc PP for beatmap id with the given mods. Results
+    are cached, and concurrent requests for the same calculation share one call."""
+    key = (BmapID, mods)
+
+    cached = _pp_cache.get(key)
+    if cached is not None and cached[0] > time.time():
+        _pp_cache.move_to_end(key)
+        return cached[1]
+
+    task = _pp_in_flight.get(key)
+    if task is None:
+        task = asyncio.create_task(_request_pp(BmapID, mods))
+        task.add_done_callback(lambda t: _on_pp_calculated(key, t))
+        _pp_in_flight[key] = task
+
+    # Shielded so one client going away does not cancel it for the others.
+    return await asyncio.shield(task)
 
 
 async def CalcPP(BmapID: int) -> float:
     """Sends request to USSR to calc PP for beatmap id."""
-    async with aiohttp.ClientSession() as session:
-        async with session.get(f"{config.api_ussr_url}api/v1/pp?b={BmapID}") as resp:
-            reqjson = await resp.json()
-            return round(reqjson["pp"][0], 2)
+    return await CalcPPMods(BmapID)
 
 
 async def CalcPPRX(BmapID: int) -> float:
     """Sends request to USSR to calc PP for beatmap id with the Relax mod."""
-    async with aiohttp.ClientSession() as session:
-        async with session.get(
-            f"{config.api_ussr_url}api/v1/pp?b={BmapID}&m=128"
-        ) as resp:
-            reqjson = await resp.json()
-            return round(reqjson["pp"][0], 2)
+    return await CalcPPMods(BmapID, 128)
 
 
 async def CalcPPAP(BmapID: int) -> float:
     """Sends request to USSR to calc PP for beatmap id with the Autopilot mod."""
-    async with aiohttp.ClientSession() as session:
-        async with session.get(
-            f"{config.api_ussr_url}api/v1/pp?b={BmapID}&m=8192"
-        ) as resp:
-            reqjson = await resp.json()
-            return round(reqjson["pp"][0], 2)
+    return await CalcPPMods(BmapID, 8192)
 
 
-def Unique(Alist: list) -> list:
-    """Returns list of unique elements of list."""
-    Uniques = []
-    for x in Alist:
-        if x not in Uniques:
-            Uniques.append(x)
-    return Uniques
+class UserListing(NamedTuple):
+    id: int
+    name: str
+    privilege: dict[str, Any]
+    country: str
+    allowed: bool
 
 
-async def FetchUsers(page: int = 0) -> list[dict[str, Any]]:
+async def FetchUsers(page: int = 0) -> list[UserListing]:
     """Fetches users for the users page."""
     # This is going to need a lot of patching up i can feel it
     Offset = 50 * page  # for the page system to work
@@ -788,84 +1173,116 @@ async def FetchUsers(page: int = 0) -> list[dict[str, Any]]:
         (Offset,),
     )
 
-    # gets list of all different privileges so an sql select call isnt ran per person
-    AllPrivileges = []
+    # gets all priv info from the cached group map
+    PrivilegeDict = {}
     for person in users:
-        AllPrivileges.append(person[2])
-    UniquePrivileges = Unique(AllPrivileges)
+        if str(person[2]) not in PrivilegeDict:
+            PrivilegeDict[str(person[2])] = await find_priv(person[2])
 
-    PrivilegeDict = {}
-    # gets all priv info
-    for Priv in UniquePrivileges:
-        priv_info = await state.database.fetch_one(
-            "SELECT name, color FROM privileges_groups WHERE privileges = %s LIMIT 1",
-            (Priv,),
+    return [
+        UserListing(
+            user[0],
+            user[1],
+            PrivilegeDict[str(user[2])],
+            user[4],
+            user[2] not in (0, 2),
         )
-
-        if not priv_info:
-            PrivilegeDict[str(Priv)] = {
-                "Name": f"Unknown ({Priv})",
-                "Privileges": Priv,
-                "Colour": "danger",
-            }
-        else:
-            PrivilegeDict[str(Priv)] = {}
-            PrivilegeDict[str(Priv)]["Name"] = priv_info[0]
-            PrivilegeDict[str(Priv)]["Privileges"] = Priv
-            PrivilegeDict[str(Priv)]["Colour"] = priv_info[1]
-            if (
-                PrivilegeDict[str(Priv)]["Colour"] == "default"
-                or PrivilegeDict[str(Priv)]["Colour"] == ""
-            ):
-                # stisla doesnt have a default button so ill hard-code change it to a warning
-                PrivilegeDict[str(Priv)]["Colour"] = "warning"
-
-    Users = []
-    for user in users:
-        Dict = {
-            "Id": user[0],
-            "Name": user[1],
-            "Privilege": PrivilegeDict[str(user[2])],
-            "Country": user[4],
-        }
-        if user[2] == 0 or user[2] == 2:
-            Dict["Allowed"] = False
-        else:
-            Dict["Allowed"] = True
-        Users.append(Dict)
-
-    return Users
+        for user in users
+    ]
 
 
 class SimpleUserData(TypedDict):
     Id: int
     Username: str
-    IsOnline: bool
+    IsOnline: Optional[bool]
     Country: str
 
 
-async def GetUser(user_id: int) -> SimpleUserData:
-    """Gets data for user. (universal)"""
-    user_data = await state.database.fetch_one(
-        "SELECT id, username, country FROM users WHERE id = %s LIMIT 1",
-        (user_id,),
+# How long (in seconds) a user's id, username and country are cached for.
+USER_CACHE_TTL = 30
+USER_CACHE_MAX_SIZE = 10_000
+
+# user_id -> (expires_at, (id, username, country) or None if not found)
+_user_cache: dict[int, tuple[float, Optional[tuple[int, str, str]]]] = {}
+
+
+def invalidate_cached_user(user_id: int) -> None:
+    """Drops the cached summary of `user_id`, eg. after a rename."""
+    _user_cache.pop(user_id, None)
+
+
+async def _fetch_user_summaries(
+    user_ids: list[int],
+) -> dict[int, Optional[tuple[int, str, str]]]:
+    """Fetches (id, username, country) for each user, going to the database only
+    for users missing from the cache (in a single query)."""
+
+    now = time.time()
+    summaries: dict[int, Optional[tuple[int, str, str]]] = {}
+    missing = []
+    for user_id in user_ids:
+        cached = _user_cache.get(user_id)
+        if cached is not None and cached[0] > now:
+            summaries[user_id] = cached[1]
+        else:
+            missing.append(user_id)
+
+    if not missing:
+        return summaries
+
+    condition = ", ".join(["%s"] * len(missing))
+    rows = await state.database.fetch_all(
+        f"SELECT id, username, country FROM users WHERE id IN ({condition})",
+        tuple(missing),
     )
+    found = {row[0]: (row[0], row[1], row[2]) for row in rows}
+
+    if len(_user_cache) > USER_CACHE_MAX_SIZE:
+        _user_cache.clear()
+
+    for user_id in missing:
+        summaries[user_id] = found.get(user_id)
+        _user_cache[user_id] = (now + USER_CACHE_TTL, summaries[user_id])
+
+    return summaries
+
+
+async def GetUsers(user_ids: list[int]) -> dict[int, SimpleUserData]:
+    """Gets data for many users at once, keyed by their id. (universal)"""
+    user_ids = list(dict.fromkeys(user_ids))
+    if not user_ids:
+        return {}
+
+    summaries = await _fetch_user_summaries(user_ids)
+    found_ids = [user_id for user_id in user_ids if summaries[user_id]]
+    online_map = await GetOnlineStatuses(found_ids)
+
+    users: dict[int, SimpleUserData] = {}
+    for user_id in user_ids:
+        summary = summaries[user_id]
+        if not summary:
+            # if no one found
+            users[user_id] = {
+                "Id": 0,
+                "Username": "Not Found",
+                "IsOnline": False,
+                "Country": "GB",  # RULE BRITANNIA
+            }
+            continue
 
-    if not user_data:
-        # if no one found
-        return {
-            "Id": 0,
-            "Username": "Not Found",
-            "IsOnline": False,
-            "Country": "GB",  # RULE BRITANNIA
+        users[user_id] = {
+            "Id": summary[0],
+            "Username": summary[1],
+            "IsOnline": online_map[user_id],
+            "Country": summary[2],
         }
 
-    return {
-        "Id": user_data[0],
-        "Username": user_data[1],
-        "IsOnline": await IsOnline(user_id),
-        "Country": user_data[2],
-    }
+    return users
+
+
+async def GetUser(user_id: int) -> SimpleUserData:
+    """Gets data for user. (universal)"""
+    return (await GetUsers([user_id]))[user_id]
 
 
 async def UserData(UserID: int) -> dict[str, Any]:
@@ -913,10 +1330,7 @@ async def UserData(UserID: int) -> dict[str, Any]:
         ip_val = "0.0.0.0"
 
     # gets privilege name
-    privilege_name = await state.database.fetch_val(
-        "SELECT name FROM privileges_groups WHERE privileges = %s LIMIT 1",
-        (user_data3[2],),
-    )
+    privilege_name = await get_privilege_group_name(user_data3[2])
 
     if not privilege_name:
         privilege_name = f"Unknown ({user_data3[2]})"
@@ -988,25 +1402,14 @@ async def RAPFetch(page: int = 1) -> list[dict[str, Any]]:
         (Offset,),
     )
 
-    # Gets list of all users
-    Users = []
-    for dat in panel_logs:
-        if dat[1] not in Users:
-            Users.append(dat[1])
-    # gets all unique users so a ton of lookups arent made
-    UniqueUsers = Unique(Users)
-
-    # now we get basic data for each user
-    UserDict = {}
-    for user in UniqueUsers:
-        UserData = await GetUser(user)
-        UserDict[str(user)] = UserData
+    # now we get basic data for every user in one go
+    UserDict = await GetUsers([dat[1] for dat in panel_logs])
 
     LogArray = []
     for log in panel_logs:
         # we making it into cool dicts
         # getting the acc data
-        LogUserData = UserDict[str(log[1])]
+        LogUserData = UserDict[log[1]]
         TheLog = {
             "LogId": log[0],
             "AccountData": LogUserData,
@@ -1076,6 +1479,7 @@ async def ApplyUserEdit(form: dict[str, str], from_id: int) -> Union[None, str]:
         privileges = await state.database.fetch_val(
             "SELECT privileges FROM users WHERE id = %s",
             (from_id,),
+            primary=True,
         )
         if privileges is None:
             return
@@ -1093,30 +1497,32 @@ async def ApplyUserEdit(form: dict[str, str], from_id: int) -> Union[None, str]:
         int(form.get("Badge5", 0)),
         int(form.get("Badge6", 0)),
     ]
-    await SetUserBadges(UserId, BadgeList)
     # SQL Queries
-    # TODO: transaction?
-    await state.database.execute(
-        "UPDATE users SET email = %s, notes = %s, privileges = %s, bypass_hwid = %s, country = %s WHERE id = %s",
-        (
-            Email,
-            Notes,
-            Privilege,
-            HWIDBypass,
-            Country,
-            UserId,
-        ),
-    )
-    await state.database.execute(
-        "UPDATE users_stats SET userpage_content = %s, username_aka = %s WHERE id = %s",
-        (
-            UserPage,
-            Aka,
-            UserId,
-        ),
-    )
+    async with state.database.transaction() as tx:
+        await SetUserBadges(UserId, BadgeList, tx)
+        await tx.execute(
+            "UPDATE users SET email = %s, notes = %s, privileges = %s, bypass_hwid = %s, country = %s WHERE id = %s",
+            (
+                Email,
+                Notes,
+                Privilege,
+                HWIDBypass,
+                Country,
+                UserId,
+            ),
+        )
+        await tx.execute(
+            "UPDATE users_stats SET userpage_content = %s, username_aka = %s WHERE id = %s",
+            (
+                UserPage,
+                Aka,
+                UserId,
+            ),
+        )
 
     # Refresh in pep.py - Rosu only
+    invalidate_cached_user(UserId)
+    invalidate_cached_privileges(UserId)
     await state.redis.publish("peppy:refresh_privs", json.dumps({"user_id": UserId}))
     await RAPLog(
         from_id,
@@ -1211,113 +1617,118 @@ async def WipeUserStats(user_id: int, modes: list[int], mods: list[str]) -> None
 
     modes: List of mode IDs (0: std, 1: taiko, 2: ctb, 3: mania)
     mods: List of mod strings ("va", "rx", "ap")
+
+    All changes are applied in a single transaction.
     """
 
     # Mapping of mode ID to suffix in database columns
     mode_suffixes = {0: "_std", 1: "_taiko", 2: "_ctb", 3: "_mania"}
 
-    # 1. Wipe Vanilla
-    if "va" in mods:
-        # construct update query
-        updates = []
-        for mode in modes:
-            suffix = mode_suffixes.get(mode)
-            if suffix:
-                updates.extend(
-                    [
-                        f"ranked_score{suffix} = 0",
-                        f"playcount{suffix} = 0",
-                        f"total_score{suffix} = 0",
-                        f"replays_watched{suffix} = 0",
-                        f"total_hits{suffix} = 0",
-                        f"level{suffix} = 0",
-                        f"playtime{suffix} = 0",
-                        f"avg_accuracy{suffix} = 0.000000000000",
-                        f"pp{suffix} = 0",
-                    ]
-                )
-                # special case for unrestricted_pp if std
-                if mode == 0:
-                    updates.append("unrestricted_pp = 0")
-
-        if updates:
-            query = f"UPDATE users_stats SET {', '.join(updates)} WHERE id = %s"
-            await state.database.execute(query, (user_id,))
-
-        # Delete scores
-        modes_sql = ",".join([str(m) for m in modes])
-        await state.database.execute(
-            f"DELETE FROM scores WHERE userid = %s AND play_mode IN ({modes_sql})",
-            (user_id,),
-        )
-        # User playcounts per map - we can't easily filter by mode here as the table doesn't have it?
-        # users_beatmap_playcount: user_id, beatmap_id, count. Beatmap has mode.
-        # It's a bit complex playcount wipe, maybe just leave it or do a complex join delete?
-        # For now, let's stick to stats and scores which is the main thing.
-
-    # 2. Wipe Relax
-    if "rx" in mods and config.srv_supports_relax:
-        updates = []
-        for mode in modes:
-            suffix = mode_suffixes.get(mode)
-            if suffix:
-                updates.extend(
-                    [
-                        f"ranked_score{suffix} = 0",
-                        f"playcount{suffix} = 0",
-                        f"total_score{suffix} = 0",
-                        f"replays_watched{suffix} = 0",
-                        f"total_hits{suffix} = 0",
-                        f"level{suffix} = 0",
-                        f"playtime{suffix} = 0",
-                        f"avg_accuracy{suffix} = 0.000000000000",
-                        f"pp{suffix} = 0",
-                    ]
-                )
-                if mode == 0:
-                    updates.append("unrestricted_pp = 0")
-
-        if updates:
-            query = f"UPDATE rx_stats SET {', '.join(updates)} WHERE id = %s"
-            await state.database.execute(query, (user_id,))
-
-        modes_sql = ",".join([str(m) for m in modes])
-        await state.database.execute(
-            f"DELETE FROM scores_relax WHERE userid = %s AND play_mode IN ({modes_sql})",
-            (user_id,),
-        )
-
-    # 3. Wipe Autopilot
-    if "ap" in mods and config.srv_supports_autopilot:
-        updates = []
-        for mode in modes:
-            suffix = mode_suffixes.get(mode)
-            if suffix:
-                updates.extend(
-                    [
-                        f"ranked_score{suffix} = 0",
-                        f"playcount{suffix} = 0",
-                        f"total_score{suffix} = 0",
-                        f"replays_watched{suffix} = 0",
-                        f"total_hits{suffix} = 0",
-                        f"level{suffix} = 0",
-                        f"playtime{suffix} = 0",
-                        f"avg_accuracy{suffix} = 0.000000000000",
-                        f"pp{suffix} = 0",
-                    ]
-                )
-                if mode == 0:
-                    updates.append("unrestricted_pp = 0")
+    async with state.database.transaction() as tx:
+        # 1. Wipe Vanilla
+        if "va" in mods:
+            # construct update query
+            updates = []
+            for mode in modes:
+                suffix = mode_suffixes.get(mode)
+                if suffix:
+                    updates.extend(
+                        [
+                            f"ranked_score{suffix} = 0",
+                            f"playcount{suffix} = 0",
+                            f"total_score{suffix} = 0",
+                            f"replays_watched{suffix} = 0",
+                            f"total_hits{suffix} = 0",
+                            f"level{suffix} = 0",
+                            f"playtime{suffix} = 0",
+                            f"avg_accuracy{suffix} = 0.000000000000",
+                            f"pp{suffix} = 0",
+                        ]
+                    )
+                    # special case for unrestricted_pp if std
+                    if mode == 0:
+                        updates.append("unrestricted_pp = 0")
+
+            if updates:
+                query = f"UPDATE users_stats SET {', '.join(updates)} WHERE id = %s"
+                await tx.execute(query, (user_id,))
+
+            # Delete scores
+            modes_sql = ",".join([str(m) for m in modes])
+            await tx.execute(
+                f"DELETE FROM scores WHERE userid = %s AND play_mode IN ({modes_sql})",
+                (user_id,),
+            )
+            # User playcounts per map - we can't easily filter by mode here as the table doesn't have it?
+            # users_beatmap_playcount: user_id, beatmap_id, count. Beatmap has mode.
+            # It's a bit complex playcount wipe, maybe just leave it or do a complex join delete?
+            # For now, let's stick to stats and scores which is the main thing.
+
+        # 2. Wipe Relax
+        if "rx" in mods and config.srv_supports_relax:
+            updates = []
+            for mode in modes:
+                suffix = mode_suffixes.get(mode)
+                if suffix:
+                    updates.extend(
+                        [
+                            f"ranked_score{suffix} = 0",
+                            f"playcount{suffix} = 0",
+                            f"total_score{suffix} = 0",
+                            f"replays_watched{suffix} = 0",
+                            f"total_hits{suffix} = 0",
+                            f"level{suffix} = 0",
+                            f"playtime{suffix} = 0",
+                            f"avg_accuracy{suffix} = 0.000000000000",
+                            f"pp{suffix} = 0",
+                        ]
+                    )
+                    if mode == 0:
+                        updates.append("unrestricted_pp = 0")
+
+            if updates:
+                query = f"UPDATE rx_stats SET {', '.join(updates)} WHERE id = %s"
+                await tx.execute(query, (user_id,))
+
+            modes_sql = ",".join([str(m) for m in modes])
+            await tx.execute(
+                f"DELETE FROM scores_relax WHERE userid = %s AND play_mode IN ({modes_sql})",
+                (user_id,),
+            )
 
-        if updates:
-            query = f"UPDATE ap_stats SET {', '.join(updates)} WHERE id = %s"
-            await state.database.execute(query, (user_id,))
+        # 3. Wipe Autopilot
+        if "ap" in mods and config.srv_supports_autopilot:
+            updates = []
+            for mode in modes:
+                suffix = mode_suffixes.get(mode)
+                if suffix:
+                    updates.extend(
+                        [
+                            f"ranked_score{suffix} = 0",
+                            f"playcount{suffix} = 0",
+                            f"total_score{suffix} = 0",
+                            f"replays_watched{suffix} = 0",
+                            f"total_hits{suffix} = 0",
+                            f"level{suffix} = 0",
+                            f"playtime{suffix} = 0",
+                            f"avg_accuracy{suffix} = 0.000000000000",
+                            f"pp{suffix} = 0",
+                        ]
+                    )
+                    if mode == 0:
+                        updates.append("unrestricted_pp = 0")
+
+            if updates:
+                query = f"UPDATE ap_stats SET {', '.join(updates)} WHERE id = %s"
+                await tx.execute(query, (user_id,))
+
+            modes_sql = ",".join([str(m) for m in modes])
+            await tx.execute(
+                f"DELETE FROM scores_ap WHERE userid = %s AND play_mode IN ({modes_sql})",
+                (user_id,),
+            )
 
-        modes_sql = ",".join([str(m) for m in modes])
-        await state.database.execute(
-            f"DELETE FROM scores_ap WHERE userid = %s AND play_mode IN ({modes_sql})",
-            (user_id,),
-        )
+    invalidate_recent_plays()
 
 
 async def WipeAccount(AccId: int) -> None:
@@ -1332,8 +1743,7 @@ async def WipeAccount(AccId: int) -> None:
         ),
     )
 
-    # TODO: transaction?
-    # Wipes EVERYTHING (all modes, all mods)
+    # Wipes EVERYTHING (all modes, all mods) in a single transaction.
     await WipeUserStats(AccId, [0, 1, 2, 3], ["va", "rx", "ap"])
 
 
@@ -1382,6 +1792,7 @@ async def RollbackUser(
         affected_maps = await state.database.fetch_all(
             f"SELECT beatmap_md5, play_mode FROM {table} WHERE userid = %s AND time > %s AND play_mode IN ({modes_sql})",
             (user_id, cutoff),
+            primary=True,
         )
 
         # Delete scores
@@ -1400,6 +1811,8 @@ async def RollbackUser(
             # Recalculate
             await calc_first_place(bmap_md5, rx, mode)
 
+    invalidate_recent_plays()
+
     # Force pep.py to reload data if possible, though there isn't a specific "recalc stats" event
     # We'll just kick the user so they can reconnect and hopefully stats update on next play
     await BanchoKick(user_id, "Your account has been rolled back. Please reconnect.")
@@ -1409,77 +1822,86 @@ async def ResUnTrict(
     user_id: int, from_id: int, note: str = "", reason: str = ""
 ) -> bool:
     """Restricts or unrestricts account yeah."""
-    if reason:
-        await state.database.execute(
-            "UPDATE users SET ban_reason = %s WHERE id = %s",
-            (
-                reason,
-                user_id,
-            ),
+    async with state.database.transaction() as tx:
+        if reason:
+            await tx.execute(
+                "UPDATE users SET ban_reason = %s WHERE id = %s",
+                (
+                    reason,
+                    user_id,
+                ),
+            )
+
+        privileges = await tx.fetch_val(
+            "SELECT privileges FROM users WHERE id = %s FOR UPDATE",
+            (user_id,),
         )
+        if privileges is None:
+            return False
 
-    privileges = await state.database.fetch_val(
-        "SELECT privileges FROM users WHERE id = %s",
-        (user_id,),
-    )
-    if privileges is None:
-        return False
+        if not privileges & 1:  # if restricted
+            new_privs = privileges | 1
+            await tx.execute(
+                "UPDATE users SET privileges = %s, ban_datetime = 0 WHERE id = %s LIMIT 1",
+                (
+                    new_privs,
+                    user_id,
+                ),
+            )  # unrestricts
+            await tx.execute(
+                "INSERT INTO ban_logs (from_id, to_id, summary, detail) VALUES (%s, %s, %s, %s)",
+                (
+                    from_id,
+                    user_id,
+                    "Unrestrict",
+                    reason if reason else "No reason provided.",
+                ),
+            )
+            TheReturn = False
+        else:
+            TimeBan = round(time.time())
+            await tx.execute(
+                "UPDATE users SET privileges = 2, ban_datetime = %s WHERE id = %s",
+                (
+                    TimeBan,
+                    user_id,
+                ),
+            )  # restrict em bois
+            await tx.execute(
+                "INSERT INTO ban_logs (from_id, to_id, summary, detail) VALUES (%s, %s, %s, %s)",
+                (
+                    from_id,
+                    user_id,
+                    "Restrict",
+                    reason if reason else "No reason provided.",
+                ),
+            )
+            TheReturn = True
 
-    if not privileges & 1:  # if restricted
-        new_privs = privileges | 1
-        await state.database.execute(
-            "UPDATE users SET privileges = %s, ban_datetime = 0 WHERE id = %s LIMIT 1",
-            (
-                new_privs,
-                user_id,
-            ),
-        )  # unrestricts
-        await state.database.execute(
-            "INSERT INTO ban_logs (from_id, to_id, summary, detail) VALUES (%s, %s, %s, %s)",
-            (
-                from_id,
-                user_id,
-                "Unrestrict",
-                reason if reason else "No reason provided.",
-            ),
-        )
-        TheReturn = False
-    else:
-        TimeBan = round(time.time())
-        await state.database.execute(
-            "UPDATE users SET privileges = 2, ban_datetime = %s WHERE id = %s",
-            (
-                TimeBan,
-                user_id,
-            ),
-        )  # restrict em bois
-        await RemoveFromLeaderboard(user_id)
-        await state.database.execute(
-            "INSERT INTO ban_logs (from_id, to_id, summary, detail) VALUES (%s, %s, %s, %s)",
-            (from_id, user_id, "Restrict", reason if reason else "No reason provided."),
-        )
-        TheReturn = True
+            # We append the note if it exists to the thingy init bruv
+            if note:
+                await tx.execute(
+                    "UPDATE users SET notes = CONCAT(notes, %s) WHERE id = %s LIMIT 1",
+                    ("\n" + note, user_id),
+                )
 
-        # We append the note if it exists to the thingy init bruv
-        if note:
-            await state.database.execute(
-                "UPDATE users SET notes = CONCAT(notes, %s) WHERE id = %s LIMIT 1",
-                ("\n" + note, user_id),
+            # First places KILL.
+            recalc_md5s = await tx.fetch_all(
+                "SELECT beatmap_md5 FROM first_places WHERE user_id = %s",
+                (user_id,),
             )
 
-        # First places KILL.
-        recalc_md5s = await state.database.fetch_all(
-            "SELECT beatmap_md5 FROM first_places WHERE user_id = %s",
-            (user_id,),
-        )
+            # Delete all of their old.
+            await tx.execute(
+                "DELETE FROM first_places WHERE user_id = %s",
+                (user_id,),
+            )
+            for bmap_md5 in recalc_md5s:
+                await calc_first_place(bmap_md5[0], tx=tx)
 
-        # Delete all of their old.
-        await state.database.execute(
-            "DELETE FROM first_places WHERE user_id = %s",
-            (user_id,),
-        )
-        for bmap_md5 in recalc_md5s:
-            await calc_first_place(bmap_md5[0])
+    # Only tell the other services once the changes are committed.
+    if TheReturn:
+        await RemoveFromLeaderboard(user_id)
 
     await UpdateBanStatus(user_id)
     return TheReturn
@@ -1489,6 +1911,7 @@ async def FreezeHandler(user_id: int) -> bool:
     freeze_status = await state.database.fetch_val(
         "SELECT frozen FROM users WHERE id = %s",
         (user_id,),
+        primary=True,
     )
     if freeze_status is None:
         return False
@@ -1530,6 +1953,7 @@ async def BanUser(user_id: int, from_id: int, reason: str = "") -> bool:
     privileges = await state.database.fetch_val(
         "SELECT privileges FROM users WHERE id = %s",
         (user_id,),
+        primary=True,
     )
     if privileges is None:
         return False
@@ -1590,64 +2014,50 @@ async def DeleteAccount(user_id: int) -> None:
         ),
     )
     # NUKE. BIG NUKE.
-    await state.database.execute("DELETE FROM scores WHERE userid = %s", (user_id,))
-    await state.database.execute("DELETE FROM users WHERE id = %s", (user_id,))
-    await state.database.execute("DELETE FROM 2fa WHERE userid = %s", (user_id,))
-    await state.database.execute(
-        "DELETE FROM 2fa_telegram WHERE userid = %s", (user_id,)
-    )
-    await state.database.execute("DELETE FROM 2fa_totp WHERE userid = %s", (user_id,))
-    await state.database.execute(
-        "DELETE FROM beatmaps_rating WHERE user_id = %s", (user_id,)
-    )
-    await state.database.execute("DELETE FROM comments WHERE user_id = %s", (user_id,))
-    await state.database.execute(
-        "DELETE FROM discord_roles WHERE userid = %s", (user_id,)
-    )
-    await state.database.execute("DELETE FROM ip_user WHERE userid = %s", (user_id,))
-    await state.database.execute(
-        "DELETE FROM profile_backgrounds WHERE uid = %s", (user_id,)
-    )
-    await state.database.execute(
-        "DELETE FROM rank_requests WHERE userid = %s", (user_id,)
-    )
-    await state.database.execute(
-        "DELETE FROM reports WHERE to_uid = %s OR from_uid = %s",
+    statements = [
+        ("DELETE FROM scores WHERE userid = %s", (user_id,)),
+        ("DELETE FROM users WHERE id = %s", (user_id,)),
+        ("DELETE FROM 2fa WHERE userid = %s", (user_id,)),
+        ("DELETE FROM 2fa_telegram WHERE userid = %s", (user_id,)),
+        ("DELETE FROM 2fa_totp WHERE userid = %s", (user_id,)),
+        ("DELETE FROM beatmaps_rating WHERE user_id = %s", (user_id,)),
+        ("DELETE FROM comments WHERE user_id = %s", (user_id,)),
+        ("DELETE FROM discord_roles WHERE userid = %s", (user_id,)),
+        ("DELETE FROM ip_user WHERE userid = %s", (user_id,)),
+        ("DELETE FROM profile_backgrounds WHERE uid = %s", (user_id,)),
+        ("DELETE FROM rank_requests WHERE userid = %s", (user_id,)),
         (
-            user_id,
-            user_id,
+            "DELETE FROM reports WHERE to_uid = %s OR from_uid = %s",
+            (
+                user_id,
+                user_id,
+            ),
         ),
-    )
-    await state.database.execute("DELETE FROM tokens WHERE user = %s", (user_id,))
-    await state.database.execute("DELETE FROM remember WHERE userid = %s", (user_id,))
-    await state.database.execute(
-        "DELETE FROM users_achievements WHERE user_id = %s",
-        (user_id,),
-    )
-    await state.database.execute(
-        "DELETE FROM users_beatmap_playcount WHERE user_id = %s",
-        (user_id,),
-    )
-    await state.database.execute(
-        "DELETE FROM users_relationships WHERE user1 = %s OR user2 = %s",
+        ("DELETE FROM tokens WHERE user = %s", (user_id,)),
+        ("DELETE FROM remember WHERE userid = %s", (user_id,)),
+        ("DELETE FROM users_achievements WHERE user_id = %s", (user_id,)),
+        ("DELETE FROM users_beatmap_playcount WHERE user_id = %s", (user_id,)),
         (
-            user_id,
-            user_id,
+            "DELETE FROM users_relationships WHERE user1 = %s OR user2 = %s",
+            (
+                user_id,
+                user_id,
+            ),
         ),
-    )
-    await state.database.execute("DELETE FROM user_badges WHERE user = %s", (user_id,))
-    await state.database.execute("DELETE FROM user_clans WHERE user = %s", (user_id,))
-    await state.database.execute("DELETE FROM users_stats WHERE id = %s", (user_id,))
+        ("DELETE FROM user_badges WHERE user = %s", (user_id,)),
+        ("DELETE FROM user_clans WHERE user = %s", (user_id,)),
+        ("DELETE FROM users_stats WHERE id = %s", (user_id,)),
+    ]
     if config.srv_supports_relax:
-        await state.database.execute(
-            "DELETE FROM scores_relax WHERE userid = %s", (user_id,)
-        )
-        await state.database.execute("DELETE FROM rx_stats WHERE id = %s", (user_id,))
+        statements.append(("DELETE FROM scores_relax WHERE userid = %s", (user_id,)))
+        statements.append(("DELETE FROM rx_stats WHERE id = %s", (user_id,)))
     if config.srv_supports_autopilot:
-        await state.database.execute(
-            "DELETE FROM scores_ap WHERE userid = %s", (user_id,)
-        )
-        await state.database.execute("DELETE FROM ap_stats WHERE id = %s", (user_id,))
+        statements.append(("DELETE FROM scores_ap WHERE userid = %s", (user_id,)))
+        statements.append(("DELETE FROM ap_stats WHERE id = %s", (user_id,)))
+
+    await state.database.execute_batch(statements)
+    invalidate_cached_user(user_id)
+    invalidate_recent_plays()
 
 
 async def BanchoKick(id: int, reason: str) -> None:
@@ -1666,9 +2076,12 @@ async def FindWithIp(Ip: str) -> list[dict[str, Any]]:
         (Ip,),
     )
 
+    users = await GetUsers([occurence[0] for occurence in occurences])
+
     resp_list = []
     for occurence in occurences:
-        user_data = cast(dict, await GetUser(occurence[0]))
+        # Copied as the same user may show up more than once.
+        user_data: dict[str, Any] = dict(users[occurence[0]])
         user_data["Ip"] = occurence[1]
         user_data["Occurencies"] = occurence[2]
         resp_list.append(user_data)
@@ -1676,12 +2089,56 @@ async def FindWithIp(Ip: str) -> list[dict[str, Any]]:
     return resp_list
 
 
-async def find_priv(priv: int) -> dict[str, Any]:
-    priv_info = await state.database.fetch_one(
-        "SELECT name, color FROM privileges_groups WHERE privileges = %s LIMIT 1",
-        (priv,),
+# How long (in seconds) the privilege group map may be used before being reloaded.
+# Edits made through this process refresh it straight away.
+PRIVILEGE_GROUP_CACHE_TTL = 300
+
+# privileges -> (name, colour)
+_privilege_groups: dict[int, tuple[str, str]] = {}
+_privilege_groups_expire = 0.0
+
+
+def invalidate_privilege_groups() -> None:
+    """Forces the privilege group map to be reloaded on next use."""
+    global _privilege_groups_expire
+
+    _privilege_groups_expire = 0.0
+
+
+async def get_privilege_groups() -> dict[int, tuple[str, str]]:
+    """Returns a map of privileges to the (name, colour) of their group, loaded
+    from the database once and kept in memory."""
+    global _privilege_groups, _privilege_groups_expire
+
+    if _privilege_groups_expire > time.time():
+        return _privilege_groups
+
+    rows = await state.database.fetch_all(
+        "SELECT privileges, name, color FROM privileges_groups ORDER BY id",
+        primary=True,
     )
 
+    groups: dict[int, tuple[str, str]] = {}
+    for privileges, name, colour in rows:
+        # Multiple groups may share a value; the first one wins.
+        groups.setdefault(privileges, (name, colour))
+
+    _privilege_groups = groups
+    _privilege_groups_expire = time.time() + PRIVILEGE_GROUP_CACHE_TTL
+    return groups
+
+
+async def get_privilege_group_name(priv: int) -> Optional[str]:
+    """Returns the name of the group with the given privileges, if any."""
+    group = (await get_privilege_groups()).get(priv)
+    if group is None:
+        return None
+    return group[0]
+
+
+async def find_priv(priv: int) -> dict[str, Any]:
+    priv_info = (await get_privilege_groups()).get(priv)
+
     if not priv_info:
         return {
             "Name": f"Unknown ({priv})",
@@ -1726,62 +2183,280 @@ async def find_all_ips(user_id: int) -> list[dict[str, Any]]:
     if not occurences:
         return []
 
-    data = []
-    for user in occurences:
-        priv_status = "Banned"
-        priv_colour = "danger"
-        if (user[4] & 3) >= 3:
-            priv_status = "OK"
-            priv_colour = "success"
-        elif (user[4] & 2) == 2:
-            priv_status = "Restricted"
-            priv_colour = "warning"
+    data = []
+    for user in occurences:
+        priv_status = "Banned"
+        priv_colour = "danger"
+        if (user[4] & 3) >= 3:
+            priv_status = "OK"
+            priv_colour = "success"
+        elif (user[4] & 2) == 2:
+            priv_status = "Restricted"
+            priv_colour = "warning"
+
+        data.append(
+            {
+                "user_id": user[0],
+                "ip": user[1],
+                "occurencies": user[2],
+                "username": user[3],
+                "privileges": await find_priv(user[4]),
+                "priv_status": {"text": priv_status, "colour": priv_colour},
+            },
+        )
+
+    return data
+
+
+# Player counts are sampled every minute and rolled up into sqlite at each of these
+# resolutions (in seconds), with how long each one is kept for.
+PLAYER_COUNT_INTERVAL = 60
+PLAYER_COUNT_RESOLUTIONS = {
+    60: 60 * 60 * 24,  # 1 day
+    300: 60 * 60 * 24 * 7,  # 1 week
+    3600: 60 * 60 * 24 * 90,  # 90 days
+    86400: 60 * 60 * 24 * 365 * 5,  # 5 years
+}
+PLAYER_COUNT_GRAPH_RESOLUTION = 300
+PLAYER_COUNT_MAX_POINTS = 1000
+PLAYER_COUNT_PRUNE_INTERVAL = 60 * 60
+
+# Bucket of the newest `PlayerCount` entry, and the samples averaged into it so far.
+_player_count_bucket = 0
+_player_count_total = 0
+_player_count_samples = 0
+
+
+def _append_player_count_bucket(bucket: int, count: int) -> None:
+    """Starts a new dash graph bucket. Buckets skipped since the last one (eg. while
+    the panel was down) are filled with zeroes, keeping every point a fixed step
+    apart."""
+    global _player_count_bucket
+
+    if _player_count_bucket:
+        skipped = (bucket - _player_count_bucket) // PLAYER_COUNT_GRAPH_RESOLUTION - 1
+        for _ in range(min(skipped, PlayerCount.capacity)):
+            PlayerCount.append(0)
+
+    PlayerCount.append(count)
+    _player_count_bucket = bucket
+
+
+async def load_player_counts() -> None:
+    """Fills `PlayerCount` with the latest dash graph buckets stored in sqlite."""
+    global _player_count_total, _player_count_samples
+
+    rows = await state.sqlite.fetch_all(
+        "SELECT bucket, total, samples FROM player_counts WHERE resolution = ? "
+        "ORDER BY bucket DESC LIMIT ?",
+        (PLAYER_COUNT_GRAPH_RESOLUTION, PlayerCount.capacity),
+    )
+    for bucket, total, samples in reversed(rows):
+        _append_player_count_bucket(bucket, total // samples)
+        _player_count_total = total
+        _player_count_samples = samples
+
+
+def record_player_count(count: int, now: int) -> None:
+    """Adds a sample to every rollup resolution and the in-memory dash graph."""
+    global _player_count_total, _player_count_samples
+
+    for resolution in PLAYER_COUNT_RESOLUTIONS:
+        state.sqlite.execute_buffered(
+            "INSERT INTO player_counts (resolution, bucket, total, samples) "
+            "VALUES (?, ?, ?, 1) ON CONFLICT (resolution, bucket) DO UPDATE SET "
+            "total = total + excluded.total, samples = samples + 1",
+            (resolution, now - now % resolution, count),
+        )
+
+    bucket = now - now % PLAYER_COUNT_GRAPH_RESOLUTION
+    if bucket == _player_count_bucket:
+        _player_count_total += count
+        _player_count_samples += 1
+        PlayerCount.set_last(_player_count_total // _player_count_samples)
+    else:
+        _append_player_count_bucket(bucket, count)
+        _player_count_total = count
+        _player_count_samples = 1
+
+
+def prune_player_counts(now: int) -> None:
+    """Drops rollup buckets older than their resolution's retention."""
+    for resolution, retention in PLAYER_COUNT_RESOLUTIONS.items():
+        state.sqlite.execute_buffered(
+            "DELETE FROM player_counts WHERE resolution = ? AND bucket < ?",
+            (resolution, now - retention),
+        )
+
+
+async def PlayerCountCollection() -> None:
+    """Designed to be ran as a background task. Grabs player count every set interval and stores it in the rollups."""
+    try:
+        await load_player_counts()
+    except Exception as e:
+        logger.error(f"Failed to load player count history: {e}")
+
+    last_prune = 0
+    while True:
+        try:
+            val = await state.redis.get("ripple:online_users")
+            now = int(time.time())
+            record_player_count(decode_int_or(val, 0), now)
+
+            if now - last_prune >= PLAYER_COUNT_PRUNE_INTERVAL:
+                prune_player_counts(now)
+                last_prune = now
+        except Exception as e:
+            logger.error(f"Failed to collect player count: {e}")
+
+        await asyncio.sleep(PLAYER_COUNT_INTERVAL)
+
+
+async def get_player_count_series(
+    start: int,
+    end: int,
+    resolution: Optional[int] = None,
+) -> dict[str, Any]:
+    """Returns the average player count per bucket between two timestamps. Without an
+    explicit resolution, the finest one that fits in `PLAYER_COUNT_MAX_POINTS` and
+    still covers the range is used."""
+    if resolution not in PLAYER_COUNT_RESOLUTIONS:
+        now = int(time.time())
+        resolution = max(PLAYER_COUNT_RESOLUTIONS)
+        for candidate, retention in sorted(PLAYER_COUNT_RESOLUTIONS.items()):
+            points = (end - start) // candidate
+            if points <= PLAYER_COUNT_MAX_POINTS and start >= now - retention:
+                resolution = candidate
+                break
+
+    rows = await state.sqlite.fetch_all(
+        "SELECT bucket, total / samples FROM player_counts WHERE resolution = ? "
+        "AND bucket BETWEEN ? AND ? ORDER BY bucket LIMIT ?",
+        (resolution, start - start % resolution, end, PLAYER_COUNT_MAX_POINTS),
+    )
+    return {
+        "resolution": resolution,
+        "points": [{"time": bucket, "count": count} for bucket, count in rows],
+    }
+
+
+# How often (in seconds) the upstream services are probed, and how many of the
+# latest probes are kept per service (an hour's worth).
+SERVICE_STATUS_INTERVAL = 30
+SERVICE_STATUS_HISTORY = 120
+
+
+class ServiceProbe(NamedTuple):
+    checked_at: int
+    up: bool
+    latency_ms: Optional[float]
+    response: dict[str, Any]
+
+
+async def _probe_api() -> tuple[bool, dict[str, Any]]:
+    async with state.http.get(config.srv_url + "api/v1/ping", timeout=1) as resp:
+        response = await resp.json()
+        return response.get("code") == 200, response
+
+
+async def _probe_lets() -> tuple[bool, dict[str, Any]]:
+    async with state.http.get(config.api_ussr_url) as resp:
+        up = resp.status == 404
+        return up, {"server_status": int(up)}
+
+
+async def _probe_bancho() -> tuple[bool, dict[str, Any]]:
+    async with state.http.get(
+        config.api_bancho_url + "/api/v1/serverStatus", timeout=1
+    ) as resp:
+        response = await resp.json(content_type="text/html")
+        return response.get("result") == 1, response
+
+
+# service -> (probe, response reported while it is unreachable)
+SERVICE_PROBES = {
+    "api": (_probe_api, {"code": 503}),
+    "lets": (_probe_lets, {"server_status": 0}),
+    "bancho": (_probe_bancho, {"result": 0}),
+}
+
+_service_history: dict[str, deque[ServiceProbe]] = {
+    service: deque(maxlen=SERVICE_STATUS_HISTORY) for service in SERVICE_PROBES
+}
+
+
+async def probe_service(service: str) -> ServiceProbe:
+    """Checks on an upstream service, recording the result in its history."""
+    probe, down_response = SERVICE_PROBES[service]
+    history = _service_history[service]
 
-        data.append(
-            {
-                "user_id": user[0],
-                "ip": user[1],
-                "occurencies": user[2],
-                "username": user[3],
-                "privileges": await find_priv(user[4]),
-                "priv_status": {"text": priv_status, "colour": priv_colour},
-            },
+    started_at = time.perf_counter()
+    try:
+        up, response = await probe()
+        latency_ms: Optional[float] = round(
+            (time.perf_counter() - started_at) * 1000,
+            2,
         )
+    except Exception as e:
+        up, response, latency_ms = False, down_response, None
 
-    return data
+        # Only log when a service goes down, not on every probe while it stays down.
+        if not history or history[-1].up:
+            logger.warning(f"Service {service} is unreachable: {e}")
 
+    result = ServiceProbe(round(time.time()), up, latency_ms, response)
+    history.append(result)
+    return result
 
-async def PlayerCountCollection() -> None:
-    """Designed to be ran as a background task. Grabs player count every set interval and puts in array."""
+
+async def ServiceStatusCollection() -> None:
+    """Designed to be ran as a background task. Probes every upstream service each
+    set interval."""
     while True:
-        try:
-            val = await state.redis.get("ripple:online_users")
-            CurrentCount = decode_int_or(val, 0)
+        await asyncio.gather(*(probe_service(service) for service in SERVICE_PROBES))
+        await asyncio.sleep(SERVICE_STATUS_INTERVAL)
 
-            PlayerCount.append(CurrentCount)
-            if len(PlayerCount) > 100:
-                PlayerCount.pop(0)
-        except Exception as e:
-            logger.error(f"Failed to collect player count: {e}")
 
-        # Async sleep for 300 seconds
-        await asyncio.sleep(300)
+def get_service_status(service: str) -> dict[str, Any]:
+    """Returns the latest known status of a service along with its recent latency
+    and up/down history."""
+    history = _service_history[service]
+    if not history:
+        return {**SERVICE_PROBES[service][1], "checked_at": 0, "history": []}
+
+    latest = history[-1]
+    return {
+        **latest.response,
+        "up": latest.up,
+        "latency_ms": latest.latency_ms,
+        "checked_at": latest.checked_at,
+        "uptime": round(sum(probe.up for probe in history) / len(history) * 100, 2),
+        "history": [
+            {
+                "checked_at": probe.checked_at,
+                "up": probe.up,
+                "latency_ms": probe.latency_ms,
+            }
+            for probe in history
+        ],
+    }
+
+
+_interval_labels: dict[int, list[str]] = {}
 
 
 def get_playcount_graph_data() -> dict[str, list[Union[int, str]]]:
     """Returns data for dash graphs."""
     Data = {}
-    Data["PlayerCount"] = PlayerCount
+    Data["PlayerCount"] = PlayerCount.to_list()
 
     # getting time intervals
-    PrevNum = 0
-    IntervalList = []
-    for x in PlayerCount:
-        IntervalList.append(str(PrevNum) + "m")
-        PrevNum += 5
-
-    IntervalList.reverse()
-    Data["IntervalList"] = IntervalList
+    count = len(Data["PlayerCount"])
+    if count not in _interval_labels:
+        step = PLAYER_COUNT_GRAPH_RESOLUTION // 60
+        _interval_labels[count] = [f"{i * step}m" for i in reversed(range(count))]
+
+    Data["IntervalList"] = _interval_labels[count]
     return Data
 
 
@@ -1796,6 +2471,7 @@ async def GiveSupporter(AccountID: int, Duration: int = 30) -> None:
     privileges = await state.database.fetch_val(
         "SELECT privileges FROM users WHERE id = %s LIMIT 1",
         (AccountID,),
+        primary=True,
     )
     if not privileges:
         return
@@ -1805,6 +2481,7 @@ async def GiveSupporter(AccountID: int, Duration: int = 30) -> None:
         ends_on = await state.database.fetch_val(
             "SELECT donor_expire FROM users WHERE id = %s",
             (AccountID,),
+            primary=True,
         )
         ends_on += 86400 * Duration
 
@@ -1828,6 +2505,7 @@ async def GiveSupporter(AccountID: int, Duration: int = 30) -> None:
                 AccountID,
             ),
         )
+        invalidate_cached_privileges(AccountID)
 
         # allowing them to set custom badges
         await state.database.execute(
@@ -1846,6 +2524,7 @@ async def RemoveSupporter(AccountID: int, session: Session) -> None:
     privileges = await state.database.fetch_val(
         "SELECT privileges FROM users WHERE id = %s LIMIT 1",
         (AccountID,),
+        primary=True,
     )
     if not privileges:
         return
@@ -1862,6 +2541,7 @@ async def RemoveSupporter(AccountID: int, session: Session) -> None:
             AccountID,
         ),
     )
+    invalidate_cached_privileges(AccountID)
     # remove custom badge perms and hide custom badge
     await state.database.execute(
         "UPDATE users_stats SET can_custom_badge = 0, show_custom_badge = 0 WHERE id = %s LIMIT 1",
@@ -1965,6 +2645,7 @@ async def DelPriv(PrivID: int) -> None:
     await state.database.execute(
         "DELETE FROM privileges_groups WHERE id = %s", (PrivID,)
     )
+    invalidate_privilege_groups()
 
 
 async def UpdatePriv(Form: dict[str, str]) -> None:
@@ -1973,6 +2654,7 @@ async def UpdatePriv(Form: dict[str, str]) -> None:
     privileges = await state.database.fetch_val(
         "SELECT privileges FROM privileges_groups WHERE id = %s",
         (Form["id"],),
+        primary=True,
     )
     if privileges is None:
         return
@@ -1982,19 +2664,128 @@ async def UpdatePriv(Form: dict[str, str]) -> None:
         "UPDATE privileges_groups SET name = %s, privileges = %s, color = %s WHERE id = %s LIMIT 1",
         (Form["name"], Form["privilege"], Form["colour"], Form["id"]),
     )
+    invalidate_privilege_groups()
     # update privs for users
     # TheFormPriv = int(Form["privilege"])
     # if TheFormPriv != 0 and TheFormPriv != 3 and TheFormPriv != 2: #i accidentally modded everyone because of this....
     #    mycursor.execute("UPDATE users SET privileges = REPLACE(privileges, %s, %s)", (PrevPriv, TheFormPriv,))
 
 
+# The most played beatmaps, overall and among unranked ones, are kept in redis sorted
+# sets (beatmap id by playcount) so pages never sort the whole beatmaps table. A few
+# more than are shown are kept so ranking maps away leaves enough suggestions.
+TOP_BEATMAPS_INTERVAL = 300
+TOP_BEATMAPS_CANDIDATES = 50
+TOP_BEATMAPS_KEY = "panel:top_beatmaps"
+MOST_PLAYED_KEY = "panel:most_played"
+SUGGESTED_RANK_KEY = "panel:suggested_rank"
+
+
+class TopBeatmap(NamedTuple):
+    beatmap_id: int
+    song_name: str
+    beatmapset_id: int
+    playcount: int
+
+
+async def refresh_top_beatmaps() -> None:
+    """Rebuilds the most played and suggested rank sets in redis."""
+    most_played, suggested = await asyncio.gather(
+        state.database.fetch_all_as(
+            TopBeatmap,
+            "SELECT beatmap_id, song_name, beatmapset_id, playcount FROM beatmaps "
+            "ORDER BY playcount DESC LIMIT %s",
+            (TOP_BEATMAPS_CANDIDATES,),
+        ),
+        state.database.fetch_all_as(
+            TopBeatmap,
+            "SELECT beatmap_id, song_name, beatmapset_id, playcount FROM beatmaps "
+            "WHERE ranked = 0 ORDER BY playcount DESC LIMIT %s",
+            (TOP_BEATMAPS_CANDIDATES,),
+        ),
+    )
+
+    async with state.redis.pipeline(transaction=True) as pipe:
+        pipe.delete(TOP_BEATMAPS_KEY, MOST_PLAYED_KEY, SUGGESTED_RANK_KEY)
+        for key, beatmaps in (
+            (MOST_PLAYED_KEY, most_played),
+            (SUGGESTED_RANK_KEY, suggested),
+        ):
+            if not beatmaps:
+                continue
+
+            pipe.zadd(
+                key,
+                {beatmap.beatmap_id: beatmap.playcount for beatmap in beatmaps},
+            )
+            pipe.hset(
+                TOP_BEATMAPS_KEY,
+                mapping={
+                    beatmap.beatmap_id: json.dumps(
+                        [beatmap.song_name, beatmap.beatmapset_id],
+                    )
+                    for beatmap in beatmaps
+                },
+            )
+        await pipe.execute()
+
+
+async def get_top_beatmaps(key: str, count: int) -> list[TopBeatmap]:
+    """Fetches the `count` most played beatmaps of a ranking, building the rankings
+    if there are none."""
+    ranking = await state.redis.zrevrange(key, 0, count - 1, withscores=True)
+    if not ranking:
+        await refresh_top_beatmaps()
+        ranking = await state.redis.zrevrange(key, 0, count - 1, withscores=True)
+
+    if not ranking:
+        return []
+
+    infos = await state.redis.hmget(
+        TOP_BEATMAPS_KEY,
+        [beatmap_id for beatmap_id, _ in ranking],
+    )
+
+    beatmaps = []
+    for (beatmap_id, playcount), info in zip(ranking, infos):
+        if info is None:
+            continue
+
+        song_name, beatmapset_id = json.loads(info)
+        beatmaps.append(
+            TopBeatmap(int(beatmap_id), song_name, beatmapset_id, int(playcount)),
+        )
+
+    return beatmaps
+
+
+async def update_suggested_rank(beatmap_ids: list[int], status: int) -> None:
+    """Keeps the suggested rank set in line with a ranking change. Ranked or loved
+    maps are dropped from it, while unranking rebuilds it as the maps may now
+    belong in it."""
+    if status == 0:
+        await refresh_top_beatmaps()
+    elif beatmap_ids:
+        await state.redis.zrem(SUGGESTED_RANK_KEY, *beatmap_ids)
+
+
+async def TopBeatmapsCollection() -> None:
+    """Designed to be ran as a background task. Rebuilds the most played rankings
+    every set interval."""
+    while True:
+        try:
+            await refresh_top_beatmaps()
+        except Exception as e:
+            logger.error(f"Failed to refresh the most played beatmaps: {e}")
+
+        await asyncio.sleep(TOP_BEATMAPS_INTERVAL)
+
+
 async def GetMostPlayed() -> dict[str, Any]:
     """Gets the beatmap with the highest playcount."""
-    beatmap = await state.database.fetch_one(
-        "SELECT beatmap_id, song_name, beatmapset_id, playcount FROM beatmaps ORDER BY playcount DESC LIMIT 1",
-    )
+    beatmaps = await get_top_beatmaps(MOST_PLAYED_KEY, 1)
 
-    if beatmap is None:
+    if not beatmaps:
         return {
             "BeatmapId": 0,
             "SongName": "No beatmaps found",
@@ -2002,11 +2793,12 @@ async def GetMostPlayed() -> dict[str, Any]:
             "Playcount": 0,
         }
 
+    beatmap = beatmaps[0]
     return {
-        "BeatmapId": beatmap[0],
-        "SongName": beatmap[1],
-        "Cover": f"https://assets.ppy.sh/beatmaps/{beatmap[2]}/covers/cover.jpg",
-        "Playcount": beatmap[3],
+        "BeatmapId": beatmap.beatmap_id,
+        "SongName": beatmap.song_name,
+        "Cover": f"https://assets.ppy.sh/beatmaps/{beatmap.beatmapset_id}/covers/cover.jpg",
+        "Playcount": beatmap.playcount,
     }
 
 
@@ -2038,7 +2830,11 @@ async def GetUserBadges(AccountID: int) -> list[int]:
     return Badges
 
 
-async def SetUserBadges(AccountID: int, Badges: list[int]) -> None:
+async def SetUserBadges(
+    AccountID: int,
+    Badges: list[int],
+    tx: Optional[MySQLTransaction] = None,
+) -> None:
     """Sets badge list to account."""
     """ Realised flaws with this approach
     CurrentBadges = GetUserBadges(AccountID) # so it knows which badges to keep
@@ -2048,21 +2844,19 @@ async def SetUserBadges(AccountID: int, Badges: list[int]) -> None:
             mycursor.execute("DELETE FROM user_badges WHERE")
         ItemFor += 1
     """
+    database = tx or state.database
+
     # This might not be the best and most efficient way but its all ive come up with in my application of user badges
-    await state.database.execute(
+    await database.execute(
         "DELETE FROM user_badges WHERE user = %s",
         (AccountID,),
     )  # deletes all existing badges
 
-    for Badge in Badges:
-        if Badge != 0 and Badge != 1:  # so we dont add empty badges
-            await state.database.execute(
-                "INSERT INTO user_badges (user, badge) VALUES (%s, %s)",
-                (
-                    AccountID,
-                    Badge,
-                ),
-            )
+    # so we dont add empty badges
+    await database.execute_many(
+        "INSERT INTO user_badges (user, badge) VALUES (%s, %s)",
+        [(AccountID, Badge) for Badge in Badges if Badge != 0 and Badge != 1],
+    )
 
 
 async def GetUserID(Username: str) -> int:
@@ -2121,6 +2915,8 @@ async def RemoveFromLeaderboard(UserID: int) -> None:
 
 async def UpdateBanStatus(UserID: int) -> None:
     """Updates the ban statuses in bancho."""
+    invalidate_cached_privileges(UserID)
+    invalidate_recent_plays()
     await state.redis.publish("peppy:ban", str(UserID))
 
 
@@ -2130,10 +2926,9 @@ async def SetBMAPSetStatus(BeatmapSet: int, Status: int, session: Session):
         session.user_id, Privileges.ADMIN_MANAGE_BEATMAPS
     )
 
-    modes = await state.database.fetch_all(
-        "SELECT DISTINCT mode FROM beatmaps WHERE beatmapset_id = %s",
-        (BeatmapSet,),
-    )
+    summary = (await get_beatmapset_summaries([BeatmapSet])).get(BeatmapSet)
+    if summary is None:
+        raise Exception("Beatmapset not found.")
 
     mode_privs = {
         0: Privileges.ADMIN_MANAGE_STD_BEATMAPS,
@@ -2145,8 +2940,7 @@ async def SetBMAPSetStatus(BeatmapSet: int, Status: int, session: Session):
     mode_filter = ""
     if not has_admin:
         rankable_modes = []
-        for mode_row in modes:
-            mode = mode_row[0]
+        for mode in summary.modes:
             mode_priv = mode_privs[mode]
             if await has_privilege_value(session.user_id, mode_priv):
                 rankable_modes.append(mode)
@@ -2165,6 +2959,12 @@ async def SetBMAPSetStatus(BeatmapSet: int, Status: int, session: Session):
             BeatmapSet,
         ),
     )
+    invalidate_beatmapset(BeatmapSet)
+    beatmaps = await state.database.fetch_all(
+        f"SELECT beatmap_id FROM beatmaps WHERE beatmapset_id = %s{mode_filter}",
+        (BeatmapSet,),
+    )
+    await update_suggested_rank([beatmap[0] for beatmap in beatmaps], Status)
 
     # getting status text
     title_text = "unranked..."
@@ -2173,21 +2973,12 @@ async def SetBMAPSetStatus(BeatmapSet: int, Status: int, session: Session):
     elif Status == 5:
         title_text = "loved!"
 
-    maps_data = await state.database.fetch_all(
-        "SELECT song_name, beatmap_id, beatmap_md5 FROM beatmaps WHERE beatmapset_id = %s",
-        (BeatmapSet,),
-    )
-
-    # Getting bmap name without diff
-    # "might work" this guy...
-    beatmap_name = maps_data[0][0].split("[")[0].rstrip()  # ¯\_(ツ)_/¯ might work
-
     embed = {
         "description": f"Ranked by {session.username}",
         "color": 242424,
         "author": {
-            "name": f"{beatmap_name} was just {title_text}",
-            "url": f"https://ussr.pl/b/{maps_data[0][1]}",
+            "name": f"{summary.title} was just {title_text}",
+            "url": f"https://ussr.pl/b/{summary.beatmap_ids[0]}",
             "icon_url": f"https://a.ussr.pl/{session.user_id}",
         },
         "footer": {"text": "via RealistikPanel!"},
@@ -2200,11 +2991,11 @@ async def SetBMAPSetStatus(BeatmapSet: int, Status: int, session: Session):
     await send_discord_webhook(config.webhook_ranked, {"embeds": [embed]})
 
     # Refresh all lbs.
-    for _, _, md5 in maps_data:
+    for md5 in summary.md5s:
         await refresh_bmap(md5)
 
 
-async def FindUserByUsername(User: str, Page: int) -> list[dict[str, Any]]:
+async def FindUserByUsername(User: str, Page: int) -> list[UserListing]:
     """Finds user by their username OR email."""
     # calculating page offsets
     Offset = 50 * (Page - 1)
@@ -2236,36 +3027,11 @@ async def FindUserByUsername(User: str, Page: int) -> list[dict[str, Any]]:
     if not users:
         return []
 
+    # gets all priv info from the cached group map
     PrivilegeDict = {}
-    AllPrivileges = []
     for person in users:
-        AllPrivileges.append(person[2])
-    UniquePrivileges = Unique(AllPrivileges)
-
-    # gets all priv info
-    for Priv in UniquePrivileges:
-        priv_info = await state.database.fetch_one(
-            "SELECT name, color FROM privileges_groups WHERE privileges = %s LIMIT 1",
-            (Priv,),
-        )
-
-        if not priv_info:
-            PrivilegeDict[str(Priv)] = {
-                "Name": f"Unknown ({Priv})",
-                "Privileges": Priv,
-                "Colour": "danger",
-            }
-        else:
-            PrivilegeDict[str(Priv)] = {}
-            PrivilegeDict[str(Priv)]["Name"] = priv_info[0]
-            PrivilegeDict[str(Priv)]["Privileges"] = Priv
-            PrivilegeDict[str(Priv)]["Colour"] = priv_info[1]
-            if (
-                PrivilegeDict[str(Priv)]["Colour"] == "default"
-                or PrivilegeDict[str(Priv)]["Colour"] == ""
-            ):
-                # stisla doesnt have a default button so ill hard-code change it to a warning
-                PrivilegeDict[str(Priv)]["Colour"] = "warning"
+        if str(person[2]) not in PrivilegeDict:
+            PrivilegeDict[str(person[2])] = await find_priv(person[2])
 
     TheUsersDict = []
     for yuser in users:
@@ -2278,18 +3044,15 @@ async def FindUserByUsername(User: str, Page: int) -> list[dict[str, Any]]:
         if not country:
             country = "XX"
 
-        Dict = {
-            "Id": yuser[0],
-            "Name": yuser[1],
-            "Privilege": PrivilegeDict[str(yuser[2])],
-            "Country": country,
-        }
-
-        if yuser[3] == 1:
-            Dict["Allowed"] = True
-        else:
-            Dict["Allowed"] = False
-        TheUsersDict.append(Dict)
+        TheUsersDict.append(
+            UserListing(
+                yuser[0],
+                yuser[1],
+                PrivilegeDict[str(yuser[2])],
+                country,
+                yuser[3] == 1,
+            ),
+        )
 
     return TheUsersDict
 
@@ -2332,6 +3095,85 @@ async def GiveSupporterForm(form: dict[str, str]) -> None:
     await GiveSupporter(int(form["accid"]), int(form["time"]))
 
 
+# How many beatmapset summaries are kept in memory, and for how long (in seconds),
+# so changes made outside the panel (eg. new difficulties) show up.
+BEATMAPSET_INDEX_SIZE = 1024
+BEATMAPSET_INDEX_TTL = 300
+
+
+class BeatmapsetSummary(NamedTuple):
+    beatmapset_id: int
+    title: str
+    modes: tuple[int, ...]
+    md5s: tuple[str, ...]
+    beatmap_ids: tuple[int, ...]
+
+
+# beatmapset_id -> (expires_at, summary), least recently used first.
+_beatmapset_index: OrderedDict[int, tuple[float, BeatmapsetSummary]] = OrderedDict()
+
+
+def invalidate_beatmapset(beatmapset_id: int) -> None:
+    """Drops a beatmapset from the summary index."""
+    _beatmapset_index.pop(beatmapset_id, None)
+
+
+def invalidate_beatmapset_by_md5(md5: str) -> None:
+    """Drops whichever beatmapset contains the beatmap with this md5."""
+    for _, summary in list(_beatmapset_index.values()):
+        if md5 in summary.md5s:
+            invalidate_beatmapset(summary.beatmapset_id)
+
+
+async def get_beatmapset_summaries(
+    beatmapset_ids: list[int],
+) -> dict[int, BeatmapsetSummary]:
+    """Fetches the title, modes, md5s and difficulty ids of each beatmapset, loading
+    those not already indexed in a single query. Unknown sets are left out."""
+    now = time.time()
+    summaries = {}
+    missing = []
+    for beatmapset_id in dict.fromkeys(beatmapset_ids):
+        cached = _beatmapset_index.get(beatmapset_id)
+        if cached is not None and cached[0] > now:
+            _beatmapset_index.move_to_end(beatmapset_id)
+            summaries[beatmapset_id] = cached[1]
+        else:
+            missing.append(beatmapset_id)
+
+    if not missing:
+        return summaries
+
+    condition = ", ".join(["%s"] * len(missing))
+    rows = await state.database.fetch_all(
+        "SELECT beatmapset_id, song_name, mode, beatmap_md5, beatmap_id FROM beatmaps "
+        f"WHERE beatmapset_id IN ({condition}) ORDER BY beatmap_id",
+        tuple(missing),
+    )
+
+    grouped: dict[int, list[tuple]] = {}
+    for row in rows:
+        grouped.setdefault(row[0], []).append(row)
+
+    for beatmapset_id, set_rows in grouped.items():
+        summary = BeatmapsetSummary(
+            beatmapset_id,
+            # kind of a way to get rid of diff name
+            set_rows[0][1].split("[")[0].rstrip(),
+            tuple(sorted({row[2] for row in set_rows})),
+            tuple(row[3] for row in set_rows),
+            tuple(row[4] for row in set_rows),
+        )
+        summaries[beatmapset_id] = summary
+        _beatmapset_index[beatmapset_id] = (now + BEATMAPSET_INDEX_TTL, summary)
+        _beatmapset_index.move_to_end(beatmapset_id)
+
+    while len(_beatmapset_index) > BEATMAPSET_INDEX_SIZE:
+        _beatmapset_index.popitem(last=False)
+
+    return summaries
+
+
 def convert_mode_to_str(mode: int) -> str:
     return {
         0: "osu!std",
@@ -2372,58 +3214,48 @@ async def GetRankRequests(
             (Offset,),
         )
 
-    # turning what we have so far into
+    # Requests may point at either a set or a single difficulty (and are sometimes
+    # added as the wrong one), so resolve every id as a difficulty too.
+    request_ids = [request[2] for request in requests]
+    set_of_beatmap = {}
+    if request_ids:
+        condition = ", ".join(["%s"] * len(request_ids))
+        set_of_beatmap = dict(
+            await state.database.fetch_all(
+                f"SELECT beatmap_id, beatmapset_id FROM beatmaps WHERE beatmap_id IN ({condition})",
+                tuple(request_ids),
+            ),
+        )
+    summaries = await get_beatmapset_summaries(
+        request_ids + list(set_of_beatmap.values()),
+    )
+    users = await _fetch_user_summaries(list({request[1] for request in requests}))
+
     TheRequests = []
-    UserIDs = []  # used for later fetching the users, so we dont have a repeat of 50 queries
     for request in requests:
-        # getting song info, like 50 individual queries at peak lmao
-        TriedSet = False
-        TriedBeatmap = False
-        if request[3] == "s":
-            request_data = await state.database.fetch_one(
-                "SELECT song_name, beatmapset_id FROM beatmaps WHERE beatmapset_id = %s LIMIT 1",
-                (request[2],),
-            )
-            TriedSet = True
+        if request[3] == "s" and request[2] in summaries:
+            summary = summaries[request[2]]
+        elif request[2] in set_of_beatmap:
+            summary = summaries.get(set_of_beatmap[request[2]])
         else:
-            request_data = await state.database.fetch_one(
-                "SELECT song_name, beatmapset_id FROM beatmaps WHERE beatmap_id = %s LIMIT 1",
-                (request[2],),
-            )
-            TriedBeatmap = True
-
-        # in case it was added incorrectly for some reason?
-        if not request_data and TriedBeatmap:
-            request_data = await state.database.fetch_one(
-                "SELECT song_name, beatmapset_id FROM beatmaps WHERE beatmapset_id = %s LIMIT 1",
-                (request[2],),
-            )
-        elif not request_data and TriedSet:
-            request_data = await state.database.fetch_one(
-                "SELECT song_name, beatmapset_id FROM beatmaps WHERE beatmap_id = %s LIMIT 1",
-                (request[2],),
-            )
+            # in case it was added incorrectly for some reason?
+            summary = summaries.get(request[2])
 
         # if the info is bad
-        if not request_data:
+        if not summary:
             SongName = "Darude - Sandstorm (Song not found)"
             BeatmapSetID = 0
             Cover = "https://i.ytimg.com/vi/erb4n8PW2qw/maxresdefault.jpg"
+            string_modes = ""
         else:
-            SongName = request_data[0]
-            SongName = SongName.split("[")[
-                0
-            ].rstrip()  # kind of a way to get rid of diff name
-
-            BeatmapSetID = request_data[1]
+            SongName = summary.title
+            BeatmapSetID = summary.beatmapset_id
             Cover = f"https://assets.ppy.sh/beatmaps/{BeatmapSetID}/covers/cover.jpg"
+            string_modes = ", ".join(
+                [convert_mode_to_str(mode) for mode in summary.modes],
+            )
 
-        modes = await state.database.fetch_all(
-            "SELECT mode FROM beatmaps WHERE beatmapset_id = %s",
-            (BeatmapSetID,),
-        )
-        unique_modes = Unique([mode[0] for mode in modes])
-        string_modes = ", ".join([convert_mode_to_str(mode) for mode in unique_modes])
+        user = users.get(request[1])
 
         # nice dict
         TheRequests.append(
@@ -2438,33 +3270,10 @@ async def GetRankRequests(
                 "Cover": Cover,
                 "BeatmapSetID": BeatmapSetID,
                 "Modes": string_modes,
+                "RequestUsername": user[1] if user else f"Unknown! ({request[1]})",
             },
         )
 
-        if request[1] not in UserIDs:
-            UserIDs.append(request[1])
-
-    # getting the Requester usernames
-    Usernames = {}
-    for AccoundIdentity in UserIDs:
-        username = await state.database.fetch_val(
-            "SELECT username FROM users WHERE id = %s",
-            (AccoundIdentity,),
-        )
-
-        if not username:
-            Usernames[str(AccoundIdentity)] = {
-                "Username": f"Unknown! ({AccoundIdentity})",
-            }
-        else:
-            Usernames[str(AccoundIdentity)] = {"Username": username}
-
-    # things arent going to be very performant lmao
-    for i in range(0, len(TheRequests)):
-        TheRequests[i]["RequestUsername"] = Usernames[str(TheRequests[i]["RequestBy"])][
-            "Username"
-        ]
-
     # flip so it shows newest first yes
     TheRequests.reverse()
     return TheRequests
@@ -2514,31 +3323,26 @@ async def RapLogCount() -> int:
     return math.ceil(count / PAGE_SIZE)
 
 
-async def SearchClans(search_term: str, Page: int = 1) -> list[dict[str, Any]]:
+class ClanListing(NamedTuple):
+    id: int
+    name: str
+    description: str
+    icon: str
+    tag: str
+
+
+async def SearchClans(search_term: str, Page: int = 1) -> list[ClanListing]:
     """Searches for clans by name or tag."""
     # offsets and limits
     Page = int(Page) - 1
     Offset = 50 * Page
 
-    clans_data = await state.database.fetch_all(
+    return await state.database.fetch_all_as(
+        ClanListing,
         "SELECT id, name, description, icon, tag FROM clans WHERE name LIKE %s OR tag LIKE %s LIMIT 50 OFFSET %s",
         (f"%{search_term}%", f"%{search_term}%", Offset),
     )
 
-    Clans = []
-    for Clan in clans_data:
-        Clans.append(
-            {
-                "ID": Clan[0],
-                "Name": Clan[1],
-                "Description": Clan[2],
-                "Icon": Clan[3],
-                "Tag": Clan[4],
-            },
-        )
-
-    return Clans
-
 
 async def SearchClanPages(search_term: str) -> int:
     """Gets amount of pages for searched clans."""
@@ -2549,30 +3353,16 @@ async def SearchClanPages(search_term: str) -> int:
     return math.ceil(count / PAGE_SIZE)
 
 
-async def GetClans(Page: int = 1) -> list[dict[str, Any]]:
+async def GetClans(Page: int = 1) -> list[ClanListing]:
     """Gets a list of all clans (v1)."""
     # offsets and limits
     Page = int(Page) - 1
     Offset = 50 * Page
-    # the sql part
-    clans_data = await state.database.fetch_all(
+    return await state.database.fetch_all_as(
+        ClanListing,
         "SELECT id, name, description, icon, tag FROM clans LIMIT 50 OFFSET %s",
         (Offset,),
     )
-    # making cool, easy to work with dicts and arrays!
-    Clans = []
-    for Clan in clans_data:
-        Clans.append(
-            {
-                "ID": Clan[0],
-                "Name": Clan[1],
-                "Description": Clan[2],
-                "Icon": Clan[3],
-                "Tag": Clan[4],
-            },
-        )
-
-    return Clans
 
 
 async def GetSearchClanPages(search_term: str) -> int:
@@ -2742,22 +3532,66 @@ async def KickFromClan(AccountID: int) -> None:
     await cache_clan(AccountID)
 
 
-async def GetUsersRegisteredBetween(Offset: int = 0, Ahead: int = 24) -> int:
-    """Gets how many players registered during a given time period (variables are in hours)."""
-    # convert the hours to secconds
-    Offset *= 3600
-    Ahead *= 3600
-
+async def _get_user_time_graph(
+    column: str,
+    Buckets: int,
+    BucketHours: int,
+) -> tuple[list[int], list[str]]:
+    """Counts users by which of the last `Buckets` periods of `BucketHours` hours
+    their `column` timestamp falls in, oldest first, using a single grouped query."""
+    BucketSeconds = BucketHours * 3600
     CurrentTime = round(time.time())
-    # now we get the time - offset
-    OffsetTime = CurrentTime - Offset
-    AheadTime = OffsetTime - Ahead
 
-    count = await state.database.fetch_val(
-        "SELECT COUNT(*) FROM users WHERE register_datetime > %s AND register_datetime < %s",
-        (AheadTime, OffsetTime),
+    rows = await state.database.fetch_all(
+        f"SELECT FLOOR((%s - {column}) / %s) AS bucket, COUNT(*) FROM users "
+        f"WHERE {column} > %s AND {column} < %s GROUP BY bucket",
+        (
+            CurrentTime,
+            BucketSeconds,
+            CurrentTime - Buckets * BucketSeconds,
+            CurrentTime,
+        ),
     )
-    return count
+    counts = {int(bucket): count for bucket, count in rows}
+
+    unit = "d" if BucketHours % 24 == 0 else "h"
+    unit_size = BucketHours // 24 if unit == "d" else BucketHours
+
+    CountList = []
+    DateList = []
+    for bucket in range(Buckets - 1, -1, -1):
+        DateList.append(f"{(bucket + 1) * unit_size}{unit}")
+        CountList.append(counts.get(bucket, 0))
+
+    return CountList, DateList
+
+
+async def GetRegistrationGraph(
+    Buckets: int = 8,
+    BucketHours: int = 24,
+) -> dict[str, list]:
+    """Gets how many players registered in each of the last `Buckets` periods of
+    `BucketHours` hours, oldest first."""
+    RegisterList, DateList = await _get_user_time_graph(
+        "register_datetime",
+        Buckets,
+        BucketHours,
+    )
+    return {"RegisterList": RegisterList, "DateList": DateList}
+
+
+async def GetActivityGraph(
+    Buckets: int = 8,
+    BucketHours: int = 24,
+) -> dict[str, list]:
+    """Gets how many players were last active in each of the last `Buckets`
+    periods of `BucketHours` hours, oldest first."""
+    ActiveList, DateList = await _get_user_time_graph(
+        "latest_activity",
+        Buckets,
+        BucketHours,
+    )
+    return {"ActiveList": ActiveList, "DateList": DateList}
 
 
 async def GetUsersActiveBetween(Offset: int = 0, Ahead: int = 24) -> int:
@@ -2786,12 +3620,14 @@ def RippleSafeUsername(Username: str) -> str:
 
 async def GetSuggestedRank() -> list[dict[str, Any]]:
     """Gets suggested maps to rank (based on play count)."""
-    beatmaps_data = await state.database.fetch_all(
-        "SELECT beatmap_id, song_name, beatmapset_id, playcount FROM beatmaps WHERE ranked = 0 ORDER BY playcount DESC LIMIT 8",
+    beatmaps_data = await get_top_beatmaps(SUGGESTED_RANK_KEY, 8)
+    summaries = await get_beatmapset_summaries(
+        [beatmap.beatmapset_id for beatmap in beatmaps_data],
     )
+
     BeatmapList = []
-    for TopBeatmap in beatmaps_data:
-        full_name = TopBeatmap[1]
+    for beatmap in beatmaps_data:
+        full_name = beatmap.song_name
         song_name = full_name
         diff_name = "Standard"
 
@@ -2800,19 +3636,16 @@ async def GetSuggestedRank() -> list[dict[str, Any]]:
             song_name = match.group(1)
             diff_name = match.group(2)
 
-        modes = await state.database.fetch_all(
-            "SELECT mode FROM beatmaps WHERE beatmapset_id = %s",
-            (TopBeatmap[2],),
-        )
-        unique_modes = Unique([mode[0] for mode in modes])
-        string_modes = ", ".join([convert_mode_to_str(mode) for mode in unique_modes])
+        summary = summaries.get(beatmap.beatmapset_id)
+        modes = summary.modes if summary else ()
+        string_modes = ", ".join([convert_mode_to_str(mode) for mode in modes])
         BeatmapList.append(
             {
-                "BeatmapId": TopBeatmap[0],
+                "BeatmapId": beatmap.beatmap_id,
                 "SongName": song_name,
                 "DiffName": diff_name,
-                "Cover": f"https://assets.ppy.sh/beatmaps/{TopBeatmap[2]}/covers/cover.jpg",
-                "Playcount": TopBeatmap[3],
+                "Cover": f"https://assets.ppy.sh/beatmaps/{beatmap.beatmapset_id}/covers/cover.jpg",
+                "Playcount": beatmap.playcount,
                 "Modes": string_modes,
             },
         )
@@ -2828,35 +3661,113 @@ async def CountRestricted() -> int:
     return count
 
 
-async def GetStatistics(MinPP: int = 0) -> dict[str, Any]:
-    """Gets statistics for the stats page and is incredibly slow...."""
-    # this is going to be a wild one
-    # TODO: REWRITE or look into caching this
-    MinPP = int(MinPP)
-    Days = 7
-    RegisterList = []
-    DateList = []
-    while Days != -1:
-        DateList.append(f"{Days + 1}d")
-        RegisterList.append(await GetUsersRegisteredBetween(24 * Days))
-        Days -= 1
-    UsersActiveToday = await GetUsersActiveBetween()
-    RecentPlay = await get_recent_plays(500, MinPP)
-    ResctictedCount = await CountRestricted()
+# How often (in seconds) the statistics snapshot is rebuilt, and the window its
+# graphs cover.
+STATS_SNAPSHOT_INTERVAL = 300
+STATS_SNAPSHOT_DAYS = 8
+STATS_SNAPSHOT_KEY = "panel:stats_snapshot"
+
+
+def _percentile(values: list[float], percentile: float) -> float:
+    if not values:
+        return 0.0
+
+    values = sorted(values)
+    idx = min(len(values) - 1, round(len(values) * percentile / 100))
+    return values[idx]
 
+
+def _pp_percentiles(plays: list[dict[str, Any]]) -> dict[str, float]:
+    pp_values = [play["pp"] for play in plays]
     return {
-        "RegisterGraph": {"RegisterList": RegisterList, "DateList": DateList},
+        "p50": _percentile(pp_values, 50),
+        "p90": _percentile(pp_values, 90),
+        "p99": _percentile(pp_values, 99),
+    }
+
+
+async def refresh_stats_snapshot() -> dict[str, Any]:
+    """Computes the statistics page data and stores it in redis."""
+    (
+        RegisterGraph,
+        ActivityGraph,
+        UsersActiveToday,
+        RecentPlay,
+        ResctictedCount,
+    ) = await asyncio.gather(
+        GetRegistrationGraph(STATS_SNAPSHOT_DAYS, 24),
+        GetActivityGraph(STATS_SNAPSHOT_DAYS, 24),
+        GetUsersActiveBetween(),
+        get_recent_plays(500),
+        CountRestricted(),
+    )
+
+    snapshot = {
+        "GeneratedAt": round(time.time()),
+        "RegisterGraph": RegisterGraph,
+        "ActivityGraph": ActivityGraph,
         "ActiveToday": UsersActiveToday,
         "RecentPlays": RecentPlay,
         "DisallowedCount": ResctictedCount,
+        "PPPercentiles": _pp_percentiles(RecentPlay),
     }
 
+    await state.redis.set(STATS_SNAPSHOT_KEY, json.dumps(snapshot))
+    return snapshot
+
+
+async def get_stats_snapshot() -> dict[str, Any]:
+    """Fetches the latest statistics snapshot, building one if there is none."""
+    raw_snapshot = await state.redis.get(STATS_SNAPSHOT_KEY)
+    if raw_snapshot is None:
+        return await refresh_stats_snapshot()
+
+    return json.loads(raw_snapshot)
+
+
+async def StatsSnapshotCollection() -> None:
+    """Designed to be ran as a background task. Rebuilds the statistics snapshot
+    every set interval."""
+    while True:
+        try:
+            await refresh_stats_snapshot()
+        except Exception as e:
+            logger.error(f"Failed to refresh the statistics snapshot: {e}")
+
+        await asyncio.sleep(STATS_SNAPSHOT_INTERVAL)
+
+
+async def GetStatistics(
+    MinPP: int = 0,
+    Days: int = STATS_SNAPSHOT_DAYS,
+) -> dict[str, Any]:
+    """Gets statistics for the stats page from the latest snapshot. Only a custom
+    pp filter or graph window is computed live."""
+    MinPP = int(MinPP)
+    stats = dict(await get_stats_snapshot())
+    stats["SnapshotAge"] = TimeToTimeAgo(stats["GeneratedAt"])
+
+    if MinPP:
+        stats["RecentPlays"] = await get_recent_plays(500, MinPP)
+        stats["PPPercentiles"] = _pp_percentiles(stats["RecentPlays"])
+
+    if Days != STATS_SNAPSHOT_DAYS:
+        # Short windows are split hourly, longer ones daily.
+        Buckets, BucketHours = (Days * 24, 1) if Days <= 2 else (Days, 24)
+        stats["RegisterGraph"], stats["ActivityGraph"] = await asyncio.gather(
+            GetRegistrationGraph(Buckets, BucketHours),
+            GetActivityGraph(Buckets, BucketHours),
+        )
+
+    return stats
+
 
 async def CreatePrivilege() -> int:
     """Creates a new default privilege."""
     privilege_id = await state.database.execute(
         "INSERT INTO privileges_groups (name, privileges, color) VALUES ('New Privilege', 0, '')",
     )
+    invalidate_privilege_groups()
     return privilege_id
 
 
@@ -2867,7 +3778,12 @@ def CoolerInt(ToInt: Any) -> int:
     return int(ToInt)
 
 
-async def calc_first_place(beatmap_md5: str, rx: int = 0, mode: int = 0) -> None:
+async def calc_first_place(
+    beatmap_md5: str,
+    rx: int = 0,
+    mode: int = 0,
+    tx: Optional[MySQLTransaction] = None,
+) -> None:
     """Calculates the new first place for a beatmap and inserts it into the
     datbaase.
 
@@ -2875,14 +3791,16 @@ async def calc_first_place(beatmap_md5: str, rx: int = 0, mode: int = 0) -> None
         beatmap_md5 (str): The MD5 of the beatmap to set the first place for.
         rx (int): THe custom mode to recalc for (0=vn, 1=rx, 2=ap)
         mode (int): The gamemode to recalc for.
+        tx (MySQLTransaction, optional): The transaction to run within, if any.
     """
+    database = tx or state.database
 
     # We have to work out table.
     table = {0: "scores", 1: "scores_relax", 2: "scores_ap"}.get(rx)
 
     # WHY IS THE ROSU IMPLEMENTATION SO SCUFFED.
     # FROM scores_ap LEFT JOIN users ON users.id = scores_ap.userid
-    first_place_data = await state.database.fetch_one(
+    first_place_data = await database.fetch_one(
         "SELECT s.id, s.userid, s.score, s.max_combo, s.full_combo, s.mods, s.300_count,"
         "s.100_count, s.50_count, s.misses_count, s.time, s.play_mode, s.completed,"
         f"s.accuracy, s.pp, s.playtime, s.beatmap_md5 FROM {table} s RIGHT JOIN users a ON a.id = s.userid WHERE "
@@ -2896,7 +3814,7 @@ async def calc_first_place(beatmap_md5: str, rx: int = 0, mode: int = 0) -> None
         return
 
     # INSERT BRRRR
-    await state.database.execute(
+    await database.execute(
         """
         INSERT INTO first_places
          (
@@ -2937,6 +3855,7 @@ async def cache_clan(user_id: int) -> None:
 async def refresh_bmap(md5: str) -> None:
     """Tells USSR to update the beatmap cache for a specific beatmap."""
 
+    invalidate_beatmapset_by_md5(md5)
     await state.redis.publish("ussr:refresh_bmap", md5)
 
 
@@ -2966,16 +3885,19 @@ async def refresh_username_cache(user_id: int, new_username: str) -> None:
     )
 
 
-class BanLog(TypedDict):
+class BanLog(NamedTuple):
     from_id: int
     from_name: str
     to_id: int
     to_name: str
     ts: int
-    expity_timeago: str
     summary: str
     detail: str
 
+    @property
+    def expity_timeago(self) -> str:
+        return TimeToTimeAgo(self.ts)
+
 
 BAN_LOG_BASE = (
     "SELECT from_id, f.username, to_id, t.username, UNIX_TIMESTAMP(ts), summary, detail "
@@ -2988,26 +3910,12 @@ BAN_LOG_BASE = (
 async def fetch_banlogs(page: int = 0) -> list[BanLog]:
     """Fetches a page of ban logs."""
 
-    ban_logs = await state.database.fetch_all(
+    return await state.database.fetch_all_as(
+        BanLog,
         BAN_LOG_BASE
         + f"ORDER BY b.id DESC LIMIT {PAGE_SIZE} OFFSET {PAGE_SIZE * page}",
     )
 
-    # Convert into dicts.
-    return [
-        {
-            "from_id": row[0],
-            "from_name": row[1],
-            "to_id": row[2],
-            "to_name": row[3],
-            "ts": row[4],
-            "summary": row[5],
-            "detail": row[6],
-            "expity_timeago": TimeToTimeAgo(row[4]),
-        }
-        for row in ban_logs
-    ]
-
 
 async def ban_count() -> int:
     """Returns the total number of bans."""
@@ -3060,25 +3968,12 @@ async def fetch_user_banlogs(user_id: int) -> list[BanLog]:
     Returns:
         list[BanLog]: A list of all banlogs for the user.
     """
-    ban_logs = await state.database.fetch_all(
+    return await state.database.fetch_all_as(
+        BanLog,
         BAN_LOG_BASE + "WHERE to_id = %s ORDER BY b.id DESC",
         (user_id,),
     )
 
-    return [
-        {
-            "from_id": row[0],
-            "from_name": row[1],
-            "to_id": row[2],
-            "to_name": row[3],
-            "ts": row[4],
-            "summary": row[5],
-            "detail": row[6],
-            "expity_timeago": TimeToTimeAgo(row[4]),
-        }
-        for row in ban_logs
-    ]
-
 
 RANDOM_CHARSET = string.ascii_letters + string.digits
 
@@ -3125,7 +4020,7 @@ async def create_clan_invite(clan_id: int) -> ClanInvite:
 
 
 # HWID Capabilities
-class HWIDLog(TypedDict):
+class HWIDLog(NamedTuple):
     id: int
     user_id: int
     mac: str
@@ -3135,43 +4030,21 @@ class HWIDLog(TypedDict):
 
 
 async def get_hwid_history(user_id: int) -> list[HWIDLog]:
-    hwid_history = await state.database.fetch_all(
+    return await state.database.fetch_all_as(
+        HWIDLog,
         "SELECT id, userid, mac, unique_id, disk_id, occurencies FROM hw_user WHERE userid = %s",
         (user_id,),
     )
 
-    return [
-        {
-            "id": res[0],
-            "user_id": res[1],
-            "mac": res[2],
-            "unique_id": res[3],
-            "disk_id": res[4],
-            "occurences": res[5],
-        }
-        for res in hwid_history
-    ]
-
 
 async def get_hwid_history_paginated(user_id: int, page: int = 0) -> list[HWIDLog]:
-    occurences = await state.database.fetch_all(
+    return await state.database.fetch_all_as(
+        HWIDLog,
         "SELECT id, userid, mac, unique_id, disk_id, occurencies FROM hw_user "
         f"WHERE userid = %s ORDER BY id DESC LIMIT {PAGE_SIZE} OFFSET {PAGE_SIZE * page}",
         (user_id,),
     )
 
-    return [
-        {
-            "id": res[0],
-            "user_id": res[1],
-            "mac": res[2],
-            "unique_id": res[3],
-            "disk_id": res[4],
-            "occurences": res[5],
-        }
-        for res in occurences
-    ]
-
 
 async def get_hwid_matches_exact(log: HWIDLog) -> list[HWIDLog]:
     """Gets a list of exactly matching HWID logs for all users other than the
@@ -3185,25 +4058,14 @@ async def get_hwid_matches_exact(log: HWIDLog) -> list[HWIDLog]:
             `log`.
     """
 
-    occurences = await state.database.fetch_all(
+    return await state.database.fetch_all_as(
+        HWIDLog,
         "SELECT id, userid, mac, unique_id, disk_id, occurencies FROM hw_user "
         "WHERE userid != %s AND mac = %s AND unique_id = %s AND "
         "disk_id = %s",
-        (log["user_id"], log["mac"], log["unique_id"], log["disk_id"]),
+        (log.user_id, log.mac, log.unique_id, log.disk_id),
     )
 
-    return [
-        {
-            "id": res[0],
-            "user_id": res[1],
-            "mac": res[2],
-            "unique_id": res[3],
-            "disk_id": res[4],
-            "occurences": res[5],
-        }
-        for res in occurences
-    ]
-
 
 async def get_hwid_matches_partial(log: HWIDLog) -> list[HWIDLog]:
     """Gets a list of partially matching HWID logs (just one item has to match)
@@ -3216,25 +4078,14 @@ async def get_hwid_matches_partial(log: HWIDLog) -> list[HWIDLog]:
         list[HWIDLog]: A list of logs sharing at least one hash with `log`.
     """
 
-    occurences = await state.database.fetch_all(
+    return await state.database.fetch_all_as(
+        HWIDLog,
         "SELECT id, userid, mac, unique_id, disk_id, occurencies FROM hw_user "
         "WHERE userid != %s AND (mac = %s OR unique_id = %s OR "
         "disk_id = %s) AND mac != 'b4ec3c4334a0249dae95c284ec5983df'",
-        (log["user_id"], log["mac"], log["unique_id"], log["disk_id"]),
+        (log.user_id, log.mac, log.unique_id, log.disk_id),
     )
 
-    return [
-        {
-            "id": res[0],
-            "user_id": res[1],
-            "mac": res[2],
-            "unique_id": res[3],
-            "disk_id": res[4],
-            "occurences": res[5],
-        }
-        for res in occurences
-    ]
-
 
 async def get_hwid_count(user_id: int) -> int:
     count = await state.database.fetch_val(
@@ -3250,7 +4101,7 @@ async def hwid_pages(user_id: int) -> int:
     return math.ceil(await get_hwid_count(user_id) / PAGE_SIZE)
 
 
-class HWIDResult(TypedDict):
+class HWIDResult(NamedTuple):
     result: HWIDLog
     exact_matches: list[HWIDLog]
     partial_matches: list[HWIDLog]
@@ -3268,18 +4119,13 @@ async def get_hwid_page(user_id: int, page: int = 0) -> HWIDPage:
 
     for log in hw_history:
         exact_matches = await get_hwid_matches_exact(log)
-        partial_matches = list(
-            filter(
-                lambda x: x not in exact_matches, await get_hwid_matches_partial(log)
-            ),
-        )
-        results.append(
-            {
-                "result": log,
-                "exact_matches": exact_matches,
-                "partial_matches": partial_matches,
-            },
-        )
+        exact_ids = {match.id for match in exact_matches}
+        partial_matches = [
+            match
+            for match in await get_hwid_matches_partial(log)
+            if match.id not in exact_ids
+        ]
+        results.append(HWIDResult(log, exact_matches, partial_matches))
 
     return {
         "user": await GetUser(user_id),
@@ -3295,6 +4141,7 @@ async def is_username_taken(username: str, ignore_user_id: int = 0) -> Optional[
     registered_exists = await state.database.fetch_val(
         "SELECT id FROM users WHERE username LIKE %s LIMIT 1",
         (username,),
+        primary=True,
     )
 
     if registered_exists:
@@ -3304,6 +4151,7 @@ async def is_username_taken(username: str, ignore_user_id: int = 0) -> Optional[
         "SELECT user_id FROM user_name_history WHERE username LIKE %s "
         "AND user_id != %s LIMIT 1",
         (username, ignore_user_id),
+        primary=True,
     )
 
     if history_exists:
@@ -3337,40 +4185,43 @@ async def change_username(
     if old_data["Id"] == 0:
         return False
 
-    # Store the old username
-    if not bypass_name_history:
-        await state.database.execute(
-            "INSERT INTO user_name_history VALUES (NULL, %s, %s, UNIX_TIMESTAMP())",
+    async with state.database.transaction() as tx:
+        # Store the old username
+        if not bypass_name_history:
+            await tx.execute(
+                "INSERT INTO user_name_history VALUES (NULL, %s, %s, UNIX_TIMESTAMP())",
+                (
+                    user_id,
+                    old_data["Username"],
+                ),
+            )
+
+        # Update existing table entries (including data repetition...)
+        await tx.execute(
+            "UPDATE users SET username = %s, username_safe = %s WHERE id = %s",
             (
+                new_username,
+                RippleSafeUsername(new_username),
                 user_id,
-                old_data["Username"],
             ),
         )
 
-    # Update existing table entries (including data repetition...)
-    await state.database.execute(
-        "UPDATE users SET username = %s, username_safe = %s WHERE id = %s",
-        (
-            new_username,
-            RippleSafeUsername(new_username),
-            user_id,
-        ),
-    )
+        for username_table in _USERNAME_TABLES:
+            await tx.execute(
+                f"UPDATE {username_table} SET username = %s WHERE id = %s",
+                (
+                    new_username,
+                    user_id,
+                ),
+            )
 
-    for username_table in _USERNAME_TABLES:
-        await state.database.execute(
-            f"UPDATE {username_table} SET username = %s WHERE id = %s",
-            (
-                new_username,
-                user_id,
-            ),
+        # If this username was previously in our name history, delete it.
+        await tx.execute(
+            "DELETE FROM user_name_history WHERE username LIKE %s AND user_id = %s",
+            (new_username, user_id),
         )
 
-    # If this username was previously in our name history, delete it.
-    await state.database.execute(
-        "DELETE FROM user_name_history WHERE username LIKE %s AND user_id = %s",
-        (new_username, user_id),
-    )
+    invalidate_cached_user(user_id)
 
     # Re-log the user if they are online (can cause some weird behaviour in-game otherwise).
     await refresh_username_cache(user_id, new_username)
@@ -1,12 +1,16 @@
 # This file is responsible for running the web server and (mostly nothing else)
 from __future__ import annotations
 
+import asyncio
+import json
+import time
 import traceback
 from copy import copy
 
 import aiohttp
 from quart import Quart
 from quart import jsonify
+from quart import make_response
 from quart import redirect
 from quart import render_template
 from quart import request
@@ -16,6 +20,7 @@ import redis.asyncio as redis
 from panel import logger
 from panel import web
 from panel import state
+from panel.adapters.mysql import memoise_reads
 from panel.adapters.mysql import MySQLPool
 from panel.adapters.sqlite import Sqlite
 from panel.common.utils import halve_list
@@ -27,6 +32,18 @@ from panel.web.responses import no_permission_response
 from panel.web.sessions import requires_privilege
 
 
+QUERY_STATS_SORT_KEYS = (
+    "total_ms",
+    "avg_ms",
+    "max_ms",
+    "p95_ms",
+    "calls",
+    "rows",
+    "acquire_avg_ms",
+)
+QUERY_STATS_MAX_LIMIT = 500
+
+
 # TODO: Make better routers.
 def configure_routes(app: Quart) -> None:
     @app.route("/")
@@ -143,6 +160,7 @@ def configure_routes(app: Quart) -> None:
 
     @app.route("/rank/<int:beatmap_id>", methods=["GET", "POST"])
     @requires_privilege(Privileges.ADMIN_ACCESS_RAP)
+    @memoise_reads
     async def panel_rank_beatmap(beatmap_id: int):
         session = web.sessions.get()
 
@@ -283,6 +301,7 @@ def configure_routes(app: Quart) -> None:
 
     @app.route("/user/edit/<int:user_id>", methods=["GET", "POST"])
     @requires_privilege(Privileges.ADMIN_MANAGE_USERS)
+    @memoise_reads
     async def panel_edit_user(user_id: int):
         session = web.sessions.get()
 
@@ -569,6 +588,7 @@ def configure_routes(app: Quart) -> None:
 
     @app.route("/rankreq/<int:Page>")
     @requires_privilege(Privileges.ADMIN_ACCESS_RAP)
+    @memoise_reads
     async def panel_view_rank_requests(Page: int):
         if Page < 1:
             return redirect("/rankreq/1")
@@ -693,12 +713,14 @@ def configure_routes(app: Quart) -> None:
     async def panel_view_server_stats():
         form = await request.form
         minimum_pp = int(form.get("minpp", "0"))
+        days = min(max(int(form.get("days", "8")), 1), 90)
         return await load_panel_template(
             "stats.html",
             route="/stats",
             title="Server Statistics",
-            StatData=await GetStatistics(minimum_pp),
+            StatData=await GetStatistics(minimum_pp, days),
             MinPP=minimum_pp,
+            Days=days,
         )
 
     @app.route("/user/hwid/<int:user_id>/<int:page>")
@@ -725,11 +747,16 @@ def configure_routes(app: Quart) -> None:
     @app.route("/js/pp/<int:bmap_id>")
     async def panel_pp_api(bmap_id: int):
         try:
+            pp, rxpp, appp = await asyncio.gather(
+                CalcPP(bmap_id),
+                CalcPPRX(bmap_id),
+                CalcPPAP(bmap_id),
+            )
             return jsonify(
                 {
-                    "pp": round(await CalcPP(bmap_id), 2),
-                    "rxpp": round(await CalcPPRX(bmap_id), 2),
-                    "appp": round(await CalcPPAP(bmap_id), 2),
+                    "pp": round(pp, 2),
+                    "rxpp": round(rxpp, 2),
+                    "appp": round(appp, 2),
                     "code": 200,
                 },
             )
@@ -739,46 +766,85 @@ def configure_routes(app: Quart) -> None:
             await log_traceback(tb, web.sessions.get(), TracebackType.DANGER)
             return jsonify({"code": 500})
 
+    @app.route("/js/database/queries")
+    @requires_privilege(Privileges.ADMIN_MANAGE_SERVERS)
+    async def panel_database_query_stats_api():
+        """Per query shape latency, row count and pool wait statistics."""
+        sort_by = request.args.get("sort", "total_ms")
+        if sort_by not in QUERY_STATS_SORT_KEYS:
+            sort_by = "total_ms"
+
+        limit = request.args.get("limit", 50, type=int)
+        limit = min(max(limit, 1), QUERY_STATS_MAX_LIMIT)
+        return jsonify(state.database.stats.snapshot(sort_by, limit))
+
+    @app.route("/js/database/pool")
+    @requires_privilege(Privileges.ADMIN_MANAGE_SERVERS)
+    async def panel_database_pool_api():
+        """Live connection pool gauges."""
+        return jsonify(state.database.pool_status())
+
+    @app.route("/js/playercount")
+    @requires_privilege(Privileges.ADMIN_ACCESS_RAP)
+    async def panel_player_count_api():
+        """Player count history over a range, at a fixed or automatic resolution."""
+        now = int(time.time())
+        end = request.args.get("end", now, type=int)
+        start = request.args.get("start", end - 60 * 60 * 24, type=int)
+        resolution = request.args.get("resolution", None, type=int)
+        if start < 0 or start > end:
+            return jsonify({"code": 400, "error": "Invalid time range."}), 400
+
+        return jsonify(await get_player_count_series(start, end, resolution))
+
+    @app.route("/js/plays/live")
+    @requires_privilege(Privileges.ADMIN_ACCESS_RAP)
+    async def panel_live_plays_api():
+        """Server-sent event stream of newly submitted plays."""
+        session = web.sessions.get()
+
+        async def stream():
+            async with subscribe_live_plays() as queue:
+                while True:
+                    try:
+                        plays = await asyncio.wait_for(queue.get(), timeout=15)
+                    except asyncio.TimeoutError:
+                        # The stream outlives the check made when it was opened.
+                        if not await has_privilege_value(
+                            session.user_id,
+                            Privileges.ADMIN_ACCESS_RAP,
+                        ):
+                            return
+
+                        # Keeps proxies from closing an idle connection.
+                        yield b": keep-alive\n\n"
+                        continue
+
+                    yield f"data: {json.dumps(plays)}\n\n".encode()
+
+        response = await make_response(
+            stream(),
+            {
+                "Content-Type": "text/event-stream",
+                "Cache-Control": "no-cache",
+                "X-Accel-Buffering": "no",
+            },
+        )
+        response.timeout = None
+        return response
+
     # api mirrors
     @app.route("/js/status/api")
     async def panel_api_status_api():
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    config.srv_url + "api/v1/ping", timeout=1
-                ) as resp:
-                    return jsonify(await resp.json())
-        except Exception:
-            tb = traceback.format_exc()
-            logger.error(f"Error while getting API Service status, error: " + tb)
-            await log_traceback(tb, web.sessions.get(), TracebackType.DANGER)
-            return jsonify({"code": 503})
+        return jsonify(get_service_status("api"))
 
     @app.route("/js/status/lets")
     async def panel_lets_status_api():
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(config.api_ussr_url) as resp:
-                    return jsonify({"server_status": int(resp.status == 404)})
-        except Exception:
-            tb = traceback.format_exc()
-            logger.error(f"Error while getting Score Service status, error: " + tb)
-            await log_traceback(tb, web.sessions.get(), TracebackType.DANGER)
-            return jsonify({"server_status": 0})
+        return jsonify(get_service_status("lets"))
 
     @app.route("/js/status/bancho")
     async def panel_bancho_status_api():
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    config.api_bancho_url + "/api/v1/serverStatus", timeout=1
-                ) as resp:
-                    return jsonify(await resp.json(content_type="text/html"))
-        except Exception:
-            tb = traceback.format_exc()
-            logger.error(f"Error while getting Bancho Service status, error: " + tb)
-            await log_traceback(tb, web.sessions.get(), TracebackType.DANGER)
-            return jsonify({"result": 0})
+        return jsonify(get_service_status("bancho"))
 
     # actions
     @app.route("/actions/comment/profile/<int:AccountID>")
@@ -1126,6 +1192,7 @@ def configure_routes(app: Quart) -> None:
 
     @app.route("/action/rankset/<int:BeatmapSet>")
     @requires_privilege(Privileges.ADMIN_ACCESS_RAP)
+    @memoise_reads
     async def panel_rank_set_action(BeatmapSet: int):
         session = web.sessions.get()
 
@@ -1138,6 +1205,7 @@ def configure_routes(app: Quart) -> None:
 
     @app.route("/action/loveset/<int:BeatmapSet>")
     @requires_privilege(Privileges.ADMIN_ACCESS_RAP)
+    @memoise_reads
     async def panel_love_set_action(BeatmapSet: int):
         session = web.sessions.get()
 
@@ -1150,6 +1218,7 @@ def configure_routes(app: Quart) -> None:
 
     @app.route("/action/unrankset/<int:BeatmapSet>")
     @requires_privilege(Privileges.ADMIN_ACCESS_RAP)
+    @memoise_reads
     async def panel_unrank_set_action(BeatmapSet: int):
         session = web.sessions.get()
 
@@ -1244,6 +1313,29 @@ def configure_error_handlers(app: Quart) -> None:
     @app.before_request
     async def pre_request():
         web.sessions.ensure()
+        state.database.begin_request()
+
+    @app.teardown_request
+    async def post_request(_):
+        state.database.end_request()
+
+
+async def init_http():
+    # One pooled session for all outbound requests, so connections (and their TLS
+    # handshakes) are reused.
+    state.http = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(
+            limit=config.api_pool_limit,
+            limit_per_host=config.api_pool_limit_per_host,
+            keepalive_timeout=30,
+        ),
+        timeout=aiohttp.ClientTimeout(total=config.api_timeout),
+    )
+
+
+async def close_http():
+    if state.http:
+        await state.http.close()
 
 
 async def init_db():
@@ -1253,8 +1345,16 @@ async def init_db():
         password=config.sql_password,
         database=config.sql_database,
         port=config.sql_port,
+        pool_size=config.sql_pool_max_size,
+        min_pool_size=config.sql_pool_min_size,
+        pool_recycle=config.sql_pool_recycle,
+        replica_host=config.sql_replica_host,
+        replica_port=config.sql_replica_port,
+        replica_user=config.sql_replica_user,
+        replica_password=config.sql_replica_password,
     )
     await state.database.connect()
+    await state.database.warm_up(config.sql_pool_warmup)
 
     state.redis = redis.Redis(
         host=config.redis_host,
@@ -1276,6 +1376,27 @@ async def init_db():
         );
         """,
     )
+    await state.sqlite.execute(
+        """
+        CREATE TABLE IF NOT EXISTS `star_ratings` (
+            `beatmap_md5` TEXT NOT NULL,
+            `mode` INT NOT NULL,
+            `stars` REAL NOT NULL,
+            PRIMARY KEY (`beatmap_md5`, `mode`)
+        );
+        """,
+    )
+    await state.sqlite.execute(
+        """
+        CREATE TABLE IF NOT EXISTS `player_counts` (
+            `resolution` INT NOT NULL,
+            `bucket` INT NOT NULL,
+            `total` INT NOT NULL,
+            `samples` INT NOT NULL,
+            PRIMARY KEY (`resolution`, `bucket`)
+        );
+        """,
+    )
     await fix_bad_user_count()
 
 
@@ -1295,13 +1416,35 @@ def init_app() -> Quart:
         template_folder="../templates",
     )
 
+    app.before_serving(init_http)
     app.before_serving(init_db)
     app.after_serving(close_db)
+    app.after_serving(close_http)
 
     @app.before_serving
     async def start_player_count():
         app.add_background_task(PlayerCountCollection)
 
+    @app.before_serving
+    async def start_privilege_refresh_listener():
+        app.add_background_task(PrivilegeRefreshListener)
+
+    @app.before_serving
+    async def start_service_status_collection():
+        app.add_background_task(ServiceStatusCollection)
+
+    @app.before_serving
+    async def start_stats_snapshot_collection():
+        app.add_background_task(StatsSnapshotCollection)
+
+    @app.before_serving
+    async def start_live_plays_collection():
+        app.add_background_task(LivePlaysCollection)
+
+    @app.before_serving
+    async def start_top_beatmaps_collection():
+        app.add_background_task(TopBeatmapsCollection)
+
     configure_routes(app)
     configure_error_handlers(app)
     web.sessions.encrypt(app)
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from aiohttp import ClientSession
 from redis import Redis
 
 from panel.adapters.mysql import MySQLPool
@@ -8,3 +9,4 @@ from panel.adapters.sqlite import Sqlite
 database: MySQLPool
 sqlite: Sqlite
 redis: Redis
+http: ClientSession